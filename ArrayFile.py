@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+
+
+def has_magic(path, magic):
+    """Return whether the file at path starts with the given magic bytes."""
+    with open(path, "rb") as file:
+        return file.read(len(magic)) == magic
+
+
+def write_arrays(path, magic, header, arrays):
+    """Write a JSON header and some 1-D arrays to a binary file.
+
+    The file holds the magic bytes, the header's length, the header (with
+    the layout of the arrays added under "arrays") and then each array,
+    padded to a multiple of 8 bytes so read_arrays() can memory-map them.
+    The file is written under a temporary name and moved into place, so it
+    is safe to write over a file that is currently mapped.
+
+    Args:
+        path (str or Path): Where to write the file.
+        magic (bytes): Bytes identifying the kind of file.
+        header (dict): JSON-serializable data to store with the arrays.
+        arrays (dict of str: numpy.ndarray): The arrays to store, by name.
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps(dict(header, arrays=layout)).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as file:
+        file.write(magic)
+        file.write(len(header).to_bytes(8, "little"))
+        file.write(header)
+        for array in arrays.values():
+            file.write(array.tobytes())
+            file.write(b"\0" * (-array.nbytes % 8))
+    os.replace(temp, path)
+
+
+def read_arrays(path, magic):
+    """Memory-map a file written by write_arrays().
+
+    The arrays are read-only views of the mapped file, so their pages are
+    loaded on demand and shared by every process that maps the same file.
+
+    Args:
+        path (str or Path): Path to the file.
+        magic (bytes): The magic bytes the file must start with.
+
+    Returns:
+        tuple: the header (dict) and the arrays (dict of str: numpy.ndarray).
+
+    Raises:
+        ValueError: the file does not start with magic.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a {magic.decode('ascii', 'replace')} file")
+        header_size = int.from_bytes(file.read(8), "little")
+        header = json.loads(file.read(header_size))
+    start = len(magic) + 8 + header_size
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, (offset, dtype, length) in header.pop("arrays").items():
+        dtype = np.dtype(dtype)
+        chunk = data[start + offset:start + offset + length * dtype.itemsize]
+        arrays[name] = np.asarray(chunk).view(dtype)
+    return header, arrays
@@ -11,11 +11,23 @@ class Book:
         title (str): The title of the book.
         author (str): The author of the book (can be an empty string if unknown).
     """
+    __slots__ = ("_callnum", "title", "author", "_key")
+
     def __init__(self, callnum, title, author):
         self.callnum = callnum
         self.title = title
         self.author = author
 
+    @property
+    def callnum(self):
+        """str: The call number; setting it discards the cached sort key."""
+        return self._callnum
+
+    @callnum.setter
+    def callnum(self, callnum):
+        self._callnum = callnum
+        self._key = None
+
     def __lt__(self, other):
         """
         Compare two Book objects based on their call numbers.
@@ -27,7 +39,7 @@ class Book:
         Returns:
             bool: True if self.callnum sorts before other.callnum, False otherwise.
         """
-        return self._parse_callnum() < other._parse_callnum()
+        return self.sort_key() < other.sort_key()
 
     def __repr__(self):
         """
@@ -41,6 +53,20 @@ class Book:
         """
         return f"Book('{self.callnum}', '{self.title}', '{self.author}')"
 
+    def sort_key(self):
+        """
+        Return the parsed call number used for sorting, parsing it on first use only.
+
+        Parameters:
+            self (Book): The current instance of the Book class.
+
+        Returns:
+            tuple: The tuple returned by _parse_callnum().
+        """
+        if self._key is None:
+            self._key = self._parse_callnum()
+        return self._key
+
     def _parse_callnum(self):
         """
         Helper method to parse the call number into its various parts for sorting.
@@ -52,17 +78,21 @@ class Book:
         Returns:
             tuple: A tuple representing the parsed call number for sorting.
         """
-        # Regular expression to extract various parts of the call number
-        match = re.match(r'^([A-Z]+)?(\d+)?(\.\d+)?\s*([A-Z])?(\d+)?(\.\d+)?\s*(\d{4})$', self.callnum)
+        # Regular expression to extract various parts of the call number:
+        # class letters and number, up to two cutters (each optionally
+        # preceded by a period) and an optional year, e.g. "QA76.73.P98 L88 2013"
+        match = re.match(r'^([A-Z]+)(\d+)(\.\d+)?(?:\s*\.?([A-Z])(\d+))?(?:\s*\.?([A-Z])(\d+))?(?:\s+(\d{4}))?$', self.callnum)
 
         if match:
-            class_letters, class_number, _, cutter_letter1, cutter_number1, _, cutter_letter2, cutter_number2, year = match.groups()
+            class_letters, class_number, class_decimal, cutter_letter1, cutter_number1, cutter_letter2, cutter_number2, year = match.groups()
 
-            class_number = int(class_number) if class_number else 0
-            cutter_number1 = float(cutter_number1) if cutter_number1 else 0
-            cutter_number2 = float(cutter_number2) if cutter_number2 else 0
+            # Class numbers are read as numbers, cutter numbers as decimal fractions
+            class_number = float(class_number + (class_decimal or ''))
+            cutter_number1 = float('0.' + cutter_number1) if cutter_number1 else 0
+            cutter_number2 = float('0.' + cutter_number2) if cutter_number2 else 0
 
-            return (class_letters, class_number, cutter_letter1, cutter_number1, cutter_letter2, cutter_number2, year)
+            return (class_letters, class_number, cutter_letter1 or '', cutter_number1,
+                    cutter_letter2 or '', cutter_number2, year or '')
         else:
             # If call number doesn't match expected pattern, return a tuple with highest priority
             return ('', 0, '', 0, '', 0, '0000')
@@ -89,7 +119,7 @@ def read_books(file_path):
 
 def print_books(books):
     """ Print information about each book, in order. """
-    for book in sorted(books):
+    for book in sorted(books, key=Book.sort_key):
         print(book)
 
 def main(filename):
@@ -1,15 +1,64 @@
 from argparse import ArgumentParser
+from contextlib import contextmanager
+import hashlib
+import numbers
+import os
 import sqlite3
 import sys
+import time
+
+import numpy as np
+
+BULK_CACHE_KIB = 256 * 1024  # page cache size used while loading
+GROUP_COLUMNS = ("year", "state", "source")
+QUERY_CHUNK = 5000  # (source, year) pairs per batched query
 
 
 class EnergyDB:
     """Build a database of energy sources in the US."""
 
-    def __init__(self, filename):
-        """Initialize the EnergyDB object and create the database."""
-        self.conn = sqlite3.connect(":memory:")
-        self.read(filename)
+    def __init__(self, filename, rollups=True, database=":memory:", backend="sqlite"):
+        """Initialize the EnergyDB object and create the database.
+
+        If rollups is true, totals by (year, source) and by (year, state,
+        source) are precomputed after loading and used to answer queries.
+
+        By default the database lives in memory. If database is a file
+        path, the data is kept there between runs in WAL mode, so several
+        processes can query it at once, and the CSV file is only re-read
+        when it has changed (see read()).
+
+        If backend is "numpy", the data is instead held in a ColumnStore of
+        NumPy arrays, which answers the same queries with vectorized masks
+        and bincount; rollups and database do not apply to it.
+
+        The number of rows loaded and the time it took are kept in the
+        rows_loaded and load_seconds attributes.
+
+        Raises:
+            ValueError: unknown backend, or a database file was requested
+                with the numpy backend.
+        """
+        if backend not in ("sqlite", "numpy"):
+            raise ValueError(f"unknown backend {backend!r}")
+        if backend == "numpy" and database != ":memory:":
+            raise ValueError("the numpy backend does not support database files")
+        self.backend = backend
+        self.rollups = rollups
+        start = time.perf_counter()
+        if backend == "numpy":
+            self.conn = None
+            with open(filename, "r") as file:
+                next(file)  # Skip the header line
+                self.columns = ColumnStore(parse_rows(file))
+            self.rows_loaded = len(self.columns)
+        else:
+            self.columns = None
+            self.conn = sqlite3.connect(database)
+            if database != ":memory:":
+                self.conn.execute("PRAGMA journal_mode = WAL")
+            self.rows_loaded = self.read(filename)
+        self.load_seconds = time.perf_counter() - start
 
     def __del__(self):
         """Clean up the database connection."""
@@ -19,22 +68,149 @@ class EnergyDB:
             pass
 
     def read(self, filename):
-        """Read data from the CSV file and insert it into the database."""
+        """Read data from the CSV file and insert it into the database.
+
+        Rows are parsed lazily and streamed into a single executemany()
+        call inside one transaction, with syncing relaxed for the duration
+        of the load.
+
+        The size, modification time and a BLAKE2 hash of the file are
+        recorded. If the same file is read into a database that already
+        holds it, nothing is done when its size and modification time are
+        unchanged; when its first size bytes still hash the same and end
+        with a newline (it has only had lines appended), just the new lines
+        are added; otherwise the table is rebuilt from scratch. Whenever the
+        table changes without rollups, any rollup tables left by an earlier
+        run are dropped so they cannot go stale.
+
+        Returns:
+            int: the number of rows inserted.
+        """
         self.conn.execute(
-            "CREATE TABLE production (year INTEGER, state TEXT, source TEXT, mwh REAL)"
+            "CREATE TABLE IF NOT EXISTS production (year INTEGER, state TEXT, source TEXT, mwh REAL)"
         )
-        with open(filename, "r") as file:
-            next(file)  # Skip the header line
-            for line in file:
-                year, state, source, mwh = line.strip().split(",")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS loaded_file (size INTEGER, mtime_ns INTEGER, digest BLOB)"
+        )
+        stat = os.stat(filename)
+        previous = self.conn.execute("SELECT size, mtime_ns, digest FROM loaded_file").fetchone()
+
+        with open(filename, "rb") as file:
+            digest = hashlib.blake2b()
+            if previous:
+                size, mtime_ns, old_digest = previous
+                if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    if self.rollups and not self._has_table("totals_by_source"):
+                        self.refresh_rollups()
+                    return 0
+                if (stat.st_size < size or hash_prefix(file, size, digest) != old_digest
+                        or not ends_line(file, size)):
+                    file.seek(0)
+                    digest = hashlib.blake2b()
+                    previous = None
+
+            lines = hashed_lines(file, digest)
+            if previous is None:
+                next(lines)  # Skip the header line
+            with self.bulk_load():
+                if previous is None:
+                    self.conn.execute("DELETE FROM production")
+                cursor = self.conn.executemany(
+                    "INSERT INTO production VALUES (?,?,?,?)", parse_rows(lines)
+                )
+                self.conn.execute("DELETE FROM loaded_file")
                 self.conn.execute(
-                    "INSERT INTO production VALUES (?,?,?,?)",
-                    (int(year), state, source, float(mwh)),
+                    "INSERT INTO loaded_file VALUES (?,?,?)",
+                    (file.tell(), stat.st_mtime_ns, digest.digest()),
                 )
-        self.conn.commit()
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS production_source_year ON production (source, year)"
+                )
+                if self.rollups:
+                    self.refresh_rollups()
+                else:
+                    self.drop_rollups()
+        return cursor.rowcount
+
+    @contextmanager
+    def bulk_load(self):
+        """Run a block of inserts as one transaction tuned for loading.
+
+        Fsyncs are skipped, the page cache is enlarged to BULK_CACHE_KIB,
+        and (unless the database is in WAL mode, which
+        other processes may be reading) the journal is kept in memory, until
+        the block finishes; the previous settings are then restored. The
+        transaction is committed if the block succeeds and rolled back
+        otherwise.
+        """
+        journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+        cache_size = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+        if journal_mode != "wal":
+            self.conn.execute("PRAGMA journal_mode = MEMORY")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(f"PRAGMA cache_size = {-BULK_CACHE_KIB}")
+        try:
+            with self.conn:
+                yield
+        finally:
+            self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            self.conn.execute(f"PRAGMA synchronous = {synchronous}")
+            self.conn.execute(f"PRAGMA cache_size = {cache_size}")
+
+    def _has_table(self, name):
+        """Return whether the database contains a table called name."""
+        cursor = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+        )
+        return cursor.fetchone() is not None
+
+    def refresh_rollups(self):
+        """Rebuild the tables of total production by year and source, and by
+        year, state and source, from the production table.
+        """
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS totals_by_source")
+            self.conn.execute("DROP TABLE IF EXISTS totals_by_state")
+            self.conn.execute(
+                "CREATE TABLE totals_by_source (source TEXT, year INTEGER, mwh REAL,"
+                " PRIMARY KEY (source, year)) WITHOUT ROWID"
+            )
+            self.conn.execute(
+                "CREATE TABLE totals_by_state (source TEXT, year INTEGER, state TEXT, mwh REAL,"
+                " PRIMARY KEY (source, year, state)) WITHOUT ROWID"
+            )
+            self.conn.execute(
+                "INSERT INTO totals_by_source"
+                " SELECT source, year, SUM(mwh) FROM production GROUP BY source, year"
+            )
+            self.conn.execute(
+                "INSERT INTO totals_by_state"
+                " SELECT source, year, state, SUM(mwh) FROM production GROUP BY source, year, state"
+            )
+
+    def drop_rollups(self):
+        """Drop the rollup tables, if there are any."""
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS totals_by_source")
+            self.conn.execute("DROP TABLE IF EXISTS totals_by_state")
 
     def production_by_source(self, source, year):
-        """Calculate the total production of a specific energy source in a given year."""
+        """Calculate the total production of a specific energy source in a given year.
+
+        Raises:
+            TypeError: year is not an integer.
+        """
+        year = check_year(year)
+        if self.columns is not None:
+            return self.columns.total(source=source, year=year)
+        if self.rollups:
+            cursor = self.conn.execute(
+                "SELECT mwh FROM totals_by_source WHERE source=? AND year=?",
+                (source, year),
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
         cursor = self.conn.execute(
             "SELECT SUM(mwh) FROM production WHERE source=? AND year=?",
             (source, year),
@@ -42,15 +218,277 @@ class EnergyDB:
         total_production = cursor.fetchone()[0]
         return total_production
 
+    def production_by_state(self, state, source, year):
+        """Calculate the total production of a specific energy source in a
+        given state and year.
+
+        Raises:
+            TypeError: year is not an integer.
+        """
+        year = check_year(year)
+        if self.columns is not None:
+            return self.columns.total(state=state, source=source, year=year)
+        if self.rollups:
+            cursor = self.conn.execute(
+                "SELECT mwh FROM totals_by_state WHERE source=? AND year=? AND state=?",
+                (source, year, state),
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        cursor = self.conn.execute(
+            "SELECT SUM(mwh) FROM production WHERE source=? AND year=? AND state=?",
+            (source, year, state),
+        )
+        return cursor.fetchone()[0]
+
+    def production_by_sources(self, queries):
+        """Calculate the total production for many (source, year) pairs at once.
+
+        All pairs are answered by one grouped query (per QUERY_CHUNK pairs)
+        instead of one query each.
+
+        Args:
+            queries (iterable of tuple): (source, year) pairs, where year is
+                an integer or a range, list or tuple of integers.
+
+        Returns:
+            dict: maps each (source, year) pair to its total production, or
+            to None if there is no data for it.
+
+        Raises:
+            TypeError: a year is not an integer or a range, list or tuple of integers.
+        """
+        pairs = []
+        for source, years in queries:
+            if isinstance(years, numbers.Integral):
+                years = [years]
+            elif not isinstance(years, (range, list, tuple)):
+                raise TypeError(f"year must be an integer or a range, list or tuple of them, not {years!r}")
+            pairs.extend((source, check_year(year)) for year in years)
+        pairs = list(dict.fromkeys(pairs))
+        results = dict.fromkeys(pairs)
+
+        if self.columns is not None:
+            totals = self.columns.totals(("source", "year"))
+            for pair in pairs:
+                results[pair] = totals.get(pair)
+            return results
+
+        if self.rollups:
+            query = "SELECT source, year, mwh FROM totals_by_source WHERE (source, year) IN (VALUES {})"
+        else:
+            query = ("SELECT source, year, SUM(mwh) FROM production"
+                     " WHERE (source, year) IN (VALUES {}) GROUP BY source, year")
+        for start in range(0, len(pairs), QUERY_CHUNK):
+            chunk = pairs[start:start + QUERY_CHUNK]
+            cursor = self.conn.execute(
+                query.format(", ".join(["(?, ?)"] * len(chunk))),
+                [value for pair in chunk for value in pair],
+            )
+            for source, year, total in cursor:
+                results[source, year] = total
+        return results
+
+    def production_series(self, source):
+        """Calculate the total production of an energy source in every year, in one pass.
 
-def main(filename):
+        Returns:
+            dict: maps each year with data for source, in increasing order,
+            to its total production.
+        """
+        if self.columns is not None:
+            totals = self.columns.totals(("source", "year"))
+            return {year: total for (name, year), total in totals.items() if name == source}
+        if self.rollups:
+            cursor = self.conn.execute(
+                "SELECT year, mwh FROM totals_by_source WHERE source=? ORDER BY year",
+                (source,),
+            )
+        else:
+            cursor = self.conn.execute(
+                "SELECT year, SUM(mwh) FROM production WHERE source=? GROUP BY year ORDER BY year",
+                (source,),
+            )
+        return dict(cursor.fetchall())
+
+    def totals(self, group_by):
+        """Calculate total production grouped by some of year, state and source.
+
+        Args:
+            group_by (sequence of str): column names from GROUP_COLUMNS.
+
+        Returns:
+            dict: maps each tuple of group values (in group_by order) to the
+            total production of the rows in that group.
+
+        Raises:
+            ValueError: group_by names an unknown column.
+        """
+        group_by = tuple(group_by)
+        for column in group_by:
+            if column not in GROUP_COLUMNS:
+                raise ValueError(f"cannot group by {column!r}")
+        if self.columns is not None:
+            return self.columns.totals(group_by)
+        columns = ", ".join(group_by)
+        if not columns:
+            return {(): self.conn.execute("SELECT SUM(mwh) FROM production").fetchone()[0]}
+        cursor = self.conn.execute(
+            f"SELECT {columns}, SUM(mwh) FROM production GROUP BY {columns}"
+        )
+        return {tuple(row[:-1]): row[-1] for row in cursor}
+
+
+class ColumnStore:
+    """Production data held column by column in NumPy arrays.
+
+    year and mwh are stored as typed arrays, and state and source are
+    dictionary-encoded: each is an array of integer codes into a sorted
+    list of the distinct values. Sums are taken with bincount, which adds
+    values in row order, so totals equal SQLite's SUM within floating-point
+    rounding (SQLite 3.43 and later use compensated summation, so the last
+    digits may differ).
+    """
+
+    def __init__(self, rows):
+        """Build the columns.
+
+        Args:
+            rows (iterable of tuple): (year, state, source, mwh) rows.
+        """
+        years, states, sources, mwh = [], [], [], []
+        for year, state, source, value in rows:
+            years.append(year)
+            states.append(state)
+            sources.append(source)
+            mwh.append(value)
+        self.mwh = np.array(mwh, dtype=np.float64)
+        self.labels = {}
+        self.codes = {}
+        for column, values in zip(GROUP_COLUMNS, (years, states, sources)):
+            labels, codes = np.unique(np.array(values), return_inverse=True)
+            self.labels[column] = labels.tolist()
+            self.codes[column] = codes.reshape(-1).astype(np.int64)
+
+    def __len__(self):
+        return len(self.mwh)
+
+    def total(self, **values):
+        """Sum mwh over the rows matching every column=value given.
+
+        Returns:
+            float or None: the total, or None if no rows match (like SQL SUM).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, value in values.items():
+            labels = self.labels[column]
+            code = np.searchsorted(labels, value) if labels else 0
+            if code == len(labels) or labels[code] != value:
+                return None
+            mask &= self.codes[column] == code
+        selected = self.mwh[mask]
+        if len(selected) == 0:
+            return None
+        return float(np.bincount(np.zeros(len(selected), dtype=np.int64), weights=selected)[0])
+
+    def totals(self, group_by):
+        """Sum mwh grouped by some of the columns.
+
+        Args:
+            group_by (tuple of str): column names from GROUP_COLUMNS.
+
+        Returns:
+            dict: maps each tuple of group values to its total. With no
+            columns, the one key () maps to the total of every row, or to
+            None if there are no rows (like SQL SUM).
+        """
+        if not group_by:
+            return {(): self.total()}
+        key = np.zeros(len(self), dtype=np.int64)
+        for column in group_by:
+            key = key * len(self.labels[column]) + self.codes[column]
+        groups, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse.reshape(-1), weights=self.mwh, minlength=len(groups))
+
+        result = {}
+        for group, total in zip(groups.tolist(), sums.tolist()):
+            labels = []
+            for column in reversed(group_by):
+                group, code = divmod(group, len(self.labels[column]))
+                labels.append(self.labels[column][code])
+            result[tuple(reversed(labels))] = total
+        return result
+
+
+def check_year(year):
+    """Return year as an int, so every backend compares it the same way.
+
+    Raises:
+        TypeError: year is not an integer (strings are rejected too, even
+            though SQLite would convert them).
+    """
+    if not isinstance(year, numbers.Integral):
+        raise TypeError(f"year must be an integer, not {year!r}")
+    return int(year)
+
+
+def hash_prefix(file, size, digest, chunk_size=1 << 20):
+    """Feed the first size bytes of a binary file to a hash object.
+
+    Returns:
+        bytes: the digest of those bytes. The file is left at offset size.
+    """
+    file.seek(0)
+    remaining = size
+    while remaining > 0:
+        chunk = file.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.digest()
+
+
+def ends_line(file, size):
+    """Return whether the first size bytes of a binary file end with a newline
+    (or are empty). The file is left at offset size.
+    """
+    if size == 0:
+        return True
+    file.seek(size - 1)
+    return file.read(1) == b"\n"
+
+
+def hashed_lines(file, digest):
+    """Yield the decoded lines of a binary file, feeding each to a hash object."""
+    for line in file:
+        digest.update(line)
+        yield line.decode()
+
+
+def parse_rows(lines):
+    """Parse CSV lines into (year, state, source, mwh) tuples, one at a time."""
+    for line in lines:
+        year, state, source, mwh = line.strip().split(",")
+        yield int(year), state, source, float(mwh)
+
+
+def main(filename, timing=False, database=":memory:", backend="sqlite"):
     """Build a database of energy sources and calculate the total production
     of solar and wind energy.
+
+    If timing is true, also report how fast the CSV file was loaded. If
+    database is a file path, the database is kept there between runs.
+    backend selects how the data is stored ("sqlite" or "numpy").
     """
-    e = EnergyDB(filename)
+    e = EnergyDB(filename, database=database, backend=backend)
+    if timing:
+        rate = e.rows_loaded / e.load_seconds if e.load_seconds else float("inf")
+        print(f"Loaded {e.rows_loaded} rows in {e.load_seconds:.2f} s ({rate:.0f} rows/sec)")
     sources = [("solar", "Solar Thermal and Photovoltaic"), ("wind", "Wind")]
+    totals = e.production_by_sources((source_str, 2017) for _, source_str in sources)
     for source_lbl, source_str in sources:
-        total_production = e.production_by_source(source_str, 2017)
+        total_production = totals[source_str, 2017]
         print(f"Total {source_lbl} production in 2017: {total_production}")
 
 
@@ -58,9 +496,12 @@ def parse_args(arglist):
     """Parse command-line arguments."""
     parser = ArgumentParser()
     parser.add_argument("file", help="path to energy CSV file")
+    parser.add_argument("-t", "--timing", action="store_true", help="report how fast the file was loaded")
+    parser.add_argument("-d", "--database", default=":memory:", help="database file to keep the data in between runs (default: in memory)")
+    parser.add_argument("-b", "--backend", choices=["sqlite", "numpy"], default="sqlite", help="how to store the data (default: sqlite)")
     return parser.parse_args(arglist)
 
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.file)
+    main(args.file, args.timing, args.database, args.backend)
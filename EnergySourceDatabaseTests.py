@@ -0,0 +1,248 @@
+import importlib.util
+import os
+import random
+import tempfile
+
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "energy_source_database", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Energy Source Database.py"))
+energy_source_database = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(energy_source_database)
+EnergyDB = energy_source_database.EnergyDB
+
+STATES = ["MD", "VA", "PA", "DE"]
+SOURCES = ["Wind", "Solar Thermal and Photovoltaic", "Coal", "Hydroelectric Conventional"]
+
+
+def random_rows(count, seed=0, years=range(2010, 2020)):
+    """Return random (year, state, source, mwh) rows."""
+    rng = random.Random(seed)
+    return [(rng.choice(years), rng.choice(STATES), rng.choice(SOURCES), round(rng.uniform(0, 5000), 3))
+            for _ in range(count)]
+
+def write_csv(path, rows, header=True, mode="w"):
+    with open(path, mode) as file:
+        if header:
+            file.write("YEAR,STATE,ENERGY SOURCE,GENERATION (Megawatthours)\n")
+        for row in rows:
+            file.write(",".join(str(value) for value in row) + "\n")
+
+def expected_total(rows, **values):
+    """Sum mwh over the rows matching every column=value given, or None."""
+    columns = {"year": 0, "state": 1, "source": 2}
+    matching = [row[3] for row in rows if all(row[columns[name]] == value for name, value in values.items())]
+    return sum(matching) if matching else None
+
+def assert_close(result, expected):
+    if expected is None:
+        assert result is None
+    else:
+        assert abs(result - expected) <= 1e-9 * max(1.0, abs(expected))
+
+def test_backends_agree():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        rows = random_rows(2000)
+        write_csv(path, rows)
+        databases = [EnergyDB(path, backend="sqlite"), EnergyDB(path, backend="numpy")]
+        for db in databases:
+            for year in (2009, 2010, 2015):
+                for source in SOURCES + ["Nuclear"]:
+                    assert_close(db.production_by_source(source, year), expected_total(rows, source=source, year=year))
+                    assert_close(db.production_by_state("MD", source, year),
+                                 expected_total(rows, state="MD", source=source, year=year))
+        for group_by in [(), ("year",), ("state", "source"), ("year", "state", "source")]:
+            sqlite_totals, numpy_totals = (db.totals(group_by) for db in databases)
+            assert sqlite_totals.keys() == numpy_totals.keys()
+            for key in sqlite_totals:
+                assert_close(numpy_totals[key], sqlite_totals[key])
+
+def test_backends_agree_on_bad_years_and_empty_tables():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        write_csv(path, [])
+        for backend in ("sqlite", "numpy"):
+            db = EnergyDB(path, backend=backend)
+            assert db.totals(()) == {(): None}
+            assert db.totals(("year",)) == {}
+            assert db.production_by_source("Wind", 2017) is None
+            for year in ("2017", 2017.0):
+                try:
+                    db.production_by_source("Wind", year)
+                except TypeError:
+                    pass
+                else:
+                    assert False, "expected TypeError"
+
+def test_bulk_load_reads_every_row():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        rows = random_rows(5000, seed=1)
+        write_csv(path, rows)
+        db = EnergyDB(path, rollups=False)
+        assert db.rows_loaded == len(rows)
+        assert db.load_seconds >= 0
+        assert db.conn.execute("SELECT COUNT(*) FROM production").fetchone()[0] == len(rows)
+        assert_close(db.totals(())[()], sum(row[3] for row in rows))
+        for key, total in db.totals(("year", "state", "source")).items():
+            assert_close(total, expected_total(rows, year=key[0], state=key[1], source=key[2]))
+
+def test_bulk_load_restores_settings_and_rolls_back():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        write_csv(path, random_rows(10, seed=2))
+        db = EnergyDB(path, rollups=False)
+        pragmas = ("journal_mode", "synchronous", "cache_size")
+        before = [db.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas]
+        try:
+            with db.bulk_load():
+                db.conn.execute("DELETE FROM production")
+                raise RuntimeError("load failed")
+        except RuntimeError:
+            pass
+        assert [db.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas] == before
+        assert db.conn.execute("SELECT COUNT(*) FROM production").fetchone()[0] == 10
+
+def test_rollups_match_raw_queries():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        rows = random_rows(3000, seed=3)
+        write_csv(path, rows)
+        rolled, raw = EnergyDB(path, rollups=True), EnergyDB(path, rollups=False)
+        assert rolled._has_table("totals_by_source") and not raw._has_table("totals_by_source")
+        for year in (2009, 2012, 2019):
+            for source in SOURCES + ["Nuclear"]:
+                assert_close(rolled.production_by_source(source, year), raw.production_by_source(source, year))
+                for state in STATES:
+                    assert_close(rolled.production_by_state(state, source, year),
+                                 raw.production_by_state(state, source, year))
+
+        rolled.drop_rollups()
+        assert not rolled._has_table("totals_by_state")
+        rolled.refresh_rollups()
+        assert_close(rolled.production_by_source("Wind", 2015), expected_total(rows, source="Wind", year=2015))
+
+def check_totals(db, rows):
+    for source in SOURCES:
+        for year in (2010, 2015, 2019):
+            assert_close(db.production_by_source(source, year), expected_total(rows, source=source, year=year))
+            assert_close(db.production_by_state("VA", source, year),
+                         expected_total(rows, state="VA", source=source, year=year))
+    assert_close(db.totals(())[()], sum(row[3] for row in rows) if rows else None)
+
+def test_database_file_reuses_and_appends():
+    with tempfile.TemporaryDirectory() as directory:
+        path, database = os.path.join(directory, "energy.csv"), os.path.join(directory, "energy.db")
+        rows = random_rows(500, seed=4)
+        write_csv(path, rows)
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 500
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        db.conn.close()
+
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 0
+        check_totals(db, rows)
+        db.conn.close()
+
+        appended = random_rows(200, seed=5)
+        write_csv(path, appended, header=False, mode="a")
+        rows += appended
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 200
+        check_totals(db, rows)
+        db.conn.close()
+
+        # Appending without rollups must not leave stale rollups for a later run
+        appended = random_rows(100, seed=6)
+        write_csv(path, appended, header=False, mode="a")
+        rows += appended
+        db = EnergyDB(path, rollups=False, database=database)
+        assert db.rows_loaded == 100
+        db.conn.close()
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 0
+        check_totals(db, rows)
+        db.conn.close()
+
+def test_database_file_rebuilds_after_rewrite():
+    with tempfile.TemporaryDirectory() as directory:
+        path, database = os.path.join(directory, "energy.csv"), os.path.join(directory, "energy.db")
+        rows = random_rows(300, seed=7)
+        write_csv(path, rows)
+        # Leave the last line unfinished, then complete it
+        with open(path, "rb+") as file:
+            file.truncate(os.path.getsize(path) - 1)
+        db = EnergyDB(path, database=database)
+        db.conn.close()
+        last = rows[-1]
+        rows[-1] = last[:3] + (float(f"{last[3]}25"),)
+        with open(path, "a") as file:
+            file.write("25\n")
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 300
+        check_totals(db, rows)
+        db.conn.close()
+
+        # Edit a value in place without changing the file's size
+        with open(path) as file:
+            text = file.read()
+        line = ",".join(str(value) for value in rows[0])
+        edited = line[:-1] + ("1" if line[-1] != "1" else "2")
+        rows[0] = rows[0][:3] + (float(edited.rsplit(",", 1)[1]),)
+        with open(path, "w") as file:
+            file.write(text.replace(line, edited, 1))
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        db = EnergyDB(path, database=database)
+        assert db.rows_loaded == 300
+        check_totals(db, rows)
+        db.conn.close()
+
+def test_production_by_sources_and_series():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "energy.csv")
+        rows = random_rows(2000, seed=8)
+        write_csv(path, rows)
+        for db in (EnergyDB(path), EnergyDB(path, rollups=False), EnergyDB(path, backend="numpy")):
+            queries = [("Wind", range(2008, 2021)), ("Coal", [2011, 2013]), ("Nuclear", 2015),
+                       ("Wind", np.int64(2012)), ("Coal", (2013,))]
+            results = db.production_by_sources(queries)
+            expected = [("Wind", year) for year in range(2008, 2021)] + [("Coal", 2011), ("Coal", 2013), ("Nuclear", 2015)]
+            assert list(results) == expected
+            for source, year in expected:
+                assert_close(results[source, year], expected_total(rows, source=source, year=year))
+                assert type(year) is int
+            assert db.production_by_sources([]) == {}
+            query_chunk, energy_source_database.QUERY_CHUNK = energy_source_database.QUERY_CHUNK, 4
+            try:
+                assert db.production_by_sources(queries) == results
+            finally:
+                energy_source_database.QUERY_CHUNK = query_chunk
+            for bad in ("2015", 2015.0, ["2015"], {2015}):
+                try:
+                    db.production_by_sources([("Wind", bad)])
+                except TypeError:
+                    pass
+                else:
+                    assert False, f"expected TypeError for {bad!r}"
+
+            for source in SOURCES + ["Nuclear"]:
+                series = db.production_series(source)
+                years = sorted({row[0] for row in rows if row[2] == source})
+                assert list(series) == years
+                for year in years:
+                    assert_close(series[year], expected_total(rows, source=source, year=year))
+
+
+if __name__ == "__main__":
+    test_backends_agree()
+    test_backends_agree_on_bad_years_and_empty_tables()
+    test_bulk_load_reads_every_row()
+    test_bulk_load_restores_settings_and_rolls_back()
+    test_rollups_match_raw_queries()
+    test_database_file_reuses_and_appends()
+    test_database_file_rebuilds_after_rewrite()
+    test_production_by_sources_and_series()
+    print("All tests passed!")
@@ -1,38 +1,499 @@
 from argparse import ArgumentParser
+import asyncio
+from bisect import bisect_left
+from collections.abc import Mapping
+import json
 import sys
 from haversine import haversine
+import numpy as np
+from scipy.spatial import cKDTree
+
+from ArrayFile import has_magic, read_arrays, write_arrays
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius, as used by haversine
+GRID_DEGREES = 1.0  # size of the latitude/longitude cells used by in_bbox
+SNAPSHOT_MAGIC = b"CITIES02"
 
 class Cities:
     """A class that reads geographic information about cities and finds the nearest cities to a specified location."""
 
     def __init__(self, filename):
         """
-        Initialize the Cities object with data 
+        Initialize the Cities object with data and build a spatial index over it.
+
+        If filename is a snapshot written by save_snapshot(), it is
+        memory-mapped instead: nothing is parsed and the arrays' pages are
+        shared by every process that opens the same snapshot, so name
+        lookups and in_bbox() are ready at once. The k-d tree is not in
+        the snapshot, though: each process builds its own from the mapped
+        points on its first nearest(), nearest_many() or within() call,
+        which takes O(n log n) time and private memory for the tree.
 
         Args:
-            filename (str): The path to the file containing city data.
+            filename (str): The path to the file containing city data, or to a snapshot.
         """
+        if has_magic(filename, SNAPSHOT_MAGIC):
+            self._open_snapshot(filename)
+            return
+
         self.cities = {}
         with open(filename, 'r') as file:
             for line in file:
                 area, city, latitude, longitude = line.strip().split(',')
                 lat_lon = (float(latitude), float(longitude))
                 self.cities[(area, city)] = lat_lon
+        self._build_index()
+
+    def _build_index(self):
+        """
+        Build the spatial indexes over the cities' positions.
+
+        A k-d tree over the positions as points on the unit sphere answers
+        distance queries: straight-line (chord) distance between points on
+        the sphere increases with great-circle distance, so the tree's
+        nearest neighbors are also the nearest cities by haversine distance.
+        A grid of GRID_DEGREES latitude/longitude cells answers bounding-box
+        queries: cities are sorted by cell, so each row of cells in a box is
+        one contiguous slice.
+        """
+        self._names = list(self.cities)
+        self._lat_lon = np.array(list(self.cities.values()), dtype=float).reshape(-1, 2)
+        self._lat, self._lon = np.radians(self._lat_lon[:, 0]), np.radians(self._lat_lon[:, 1])
+        self._points = to_unit_vectors(self._lat_lon)
+        self._kd_tree = None
+        self._name_order = None
+
+        rows, cols = grid_cell(self._lat_lon[:, 0], self._lat_lon[:, 1])
+        cells = rows * grid_columns() + cols
+        self._cell_order = np.argsort(cells, kind='stable')
+        self._cell_start = np.searchsorted(cells[self._cell_order], np.arange(grid_rows() * grid_columns() + 1))
+
+    @property
+    def _tree(self):
+        """The k-d tree over the cities' unit vectors, built on first use.
+
+        scipy's cKDTree can only be built, not mapped from a file, so this
+        is the one index a snapshot cannot share between processes.
+        """
+        if self._kd_tree is None:
+            self._kd_tree = cKDTree(self._points)
+        return self._kd_tree
+
+    def save_snapshot(self, path):
+        """
+        Write the cities and their spatial indexes to a binary snapshot file.
+
+        The file is written with write_arrays() and holds only plain
+        arrays: the coordinates and their unit vectors, a string table of
+        area and city names (an offsets array into UTF-8 bytes), the names'
+        sort order for lookups and the bounding-box grid. The k-d tree is
+        left out (see _tree), since storing it would mean pickling it.
+
+        Args:
+            path (str): Where to write the snapshot.
+        """
+        strings = [name.encode('utf-8') for key in self._names for name in key]
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in strings], out=offsets[1:])
+        name_order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        arrays = {
+            "lat_lon": np.ascontiguousarray(self._lat_lon, dtype=np.float64).ravel(),
+            "lat": self._lat.astype(np.float64),
+            "lon": self._lon.astype(np.float64),
+            "string_offsets": offsets,
+            "strings": np.frombuffer(b"".join(strings), dtype=np.uint8),
+            "name_order": np.array(name_order, dtype=np.int64),
+            "cell_order": self._cell_order.astype(np.int64),
+            "cell_start": self._cell_start.astype(np.int64),
+            "points": np.ascontiguousarray(self._points, dtype=np.float64).ravel(),
+        }
+        write_arrays(path, SNAPSHOT_MAGIC, {"grid_degrees": GRID_DEGREES}, arrays)
+
+    def _open_snapshot(self, filename):
+        """
+        Memory-map a snapshot written by save_snapshot().
+
+        Args:
+            filename (str): The path to the snapshot.
 
-    def nearest(self, point):
+        Raises:
+            ValueError: the snapshot was built with a different GRID_DEGREES.
+        """
+        header, arrays = read_arrays(filename, SNAPSHOT_MAGIC)
+        if header["grid_degrees"] != GRID_DEGREES:
+            raise ValueError(f"{filename} was built with a grid of {header['grid_degrees']} degrees")
+
+        self._lat_lon = arrays["lat_lon"].reshape(-1, 2)
+        self._lat, self._lon = arrays["lat"], arrays["lon"]
+        self._names = _NameTable(arrays["string_offsets"], arrays["strings"])
+        self._name_order = arrays["name_order"]
+        self._cell_order, self._cell_start = arrays["cell_order"], arrays["cell_start"]
+        self._points = arrays["points"].reshape(-1, 3)
+        self._kd_tree = None
+        self.cities = _SnapshotCities(self)
+
+    def _find(self, key):
+        """
+        Return the position of an (area, city) key in a snapshot.
+
+        Raises:
+            KeyError: there is no such city.
+        """
+        names = self._names
+        i = bisect_left(self._name_order, key, key=names.__getitem__)
+        if i == len(self._name_order) or names[self._name_order[i]] != key:
+            raise KeyError(key)
+        return int(self._name_order[i])
+
+    def nearest(self, point, k=5):
         """
         Find the nearest cities to a specified latitude and longitude.
 
         Args:
             point (tuple): A tuple consisting of a latitude and longitude expressed as floats.
+            k (int): The number of cities to return (default: 5).
+
+        Returns:
+            list: A list of the k closest cities to the specified point, in
+            the same order as sorting every city by haversine distance.
+        """
+        k = min(k, len(self._names))
+        if k <= 0:
+            return []
+        target = to_unit_vectors(np.array([point], dtype=float))[0]
+        chord, _ = self._tree.query(target, k=k)
+        radius = np.max(chord) * (1 + 1e-9) + 1e-12
+
+        # Re-rank everything up to the k-th chord distance (plus rounding
+        # slack) with haversine, breaking ties by file order like sorted().
+        candidates = sorted(self._tree.query_ball_point(target, radius))
+        candidates.sort(key=lambda i: haversine(point, tuple(self._lat_lon[i].tolist())))
+        return [self._names[i] for i in candidates[:k]]
+
+    def nearest_many(self, points, k=5, block_size=100000):
+        """
+        Find the nearest cities to many points at once.
+
+        Points are processed in blocks: each block is looked up in the k-d
+        tree in one call, the haversine distances to the candidates are
+        computed with NumPy, and each row is ordered by distance and then by
+        file order. Rows whose order could be changed by rounding (near-ties
+        in distance) are answered with nearest() instead, so the results
+        are the same as calling nearest() on every point. Memory use is
+        bounded by block_size * k.
+
+        Args:
+            points (sequence or numpy.ndarray): Latitudes and longitudes, as a
+                sequence of (lat, lon) tuples or an array of shape (n, 2).
+            k (int): The number of cities to return for each point (default: 5).
+            block_size (int): The number of points to process at a time (default: 100000).
+
+        Returns:
+            list: For each point, a list of the k closest cities to it.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        k = min(k, len(self._names))
+        if k <= 0:
+            return [[] for _ in range(len(points))]
+        # One extra neighbor shows whether the k-th place is contested
+        width = min(k + 1, len(self._names))
+
+        results = []
+        for start in range(0, len(points), block_size):
+            block = points[start:start + block_size]
+            _, index = self._tree.query(to_unit_vectors(block), k=width)
+            index = index.reshape(len(block), width)
+            distance = haversine_array(np.radians(block[:, :1]), np.radians(block[:, 1:]),
+                                       self._lat[index], self._lon[index])
+            order = np.lexsort((index, distance), axis=-1)
+            index = np.take_along_axis(index, order, axis=-1)
+            distance = np.take_along_axis(distance, order, axis=-1)
+
+            gaps = np.diff(distance, axis=-1)
+            slack = 1e-9 * distance[:, 1:] + 1e-9
+            near_tie = ((gaps > 0) & (gaps <= slack)).any(axis=-1)
+            if width > k:
+                near_tie |= gaps[:, k - 1] <= slack[:, k - 1]
+
+            for row, point, tied in zip(index[:, :k].tolist(), block.tolist(), near_tie.tolist()):
+                if tied:
+                    results.append(self.nearest(tuple(point), k))
+                else:
+                    results.append([self._names[i] for i in row])
+        return results
+
+    def within(self, point, radius_km):
+        """
+        Find every city within a distance of a specified latitude and longitude.
+
+        Args:
+            point (tuple): A tuple consisting of a latitude and longitude expressed as floats.
+            radius_km (float): The maximum distance in kilometers.
+
+        Returns:
+            list: The cities no more than radius_km from point, closest first
+            (cities at the same distance are in file order).
+        """
+        if radius_km < 0 or not self._names:
+            return []
+        # Chord length on the unit sphere for an arc of radius_km
+        chord = 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+        target = to_unit_vectors(np.array([point], dtype=float))[0]
+        index = np.array(sorted(self._tree.query_ball_point(target, chord * (1 + 1e-9) + 1e-12)), dtype=int)
+
+        lat, lon = np.radians(point[0]), np.radians(point[1])
+        distance = haversine_array(lat, lon, self._lat[index], self._lon[index])
+        keep = distance <= radius_km
+        index, distance = index[keep], distance[keep]
+        return [self._names[i] for i in index[np.argsort(distance, kind='stable')].tolist()]
+
+    def in_bbox(self, south, west, north, east):
+        """
+        Find every city inside a latitude/longitude bounding box.
+
+        Args:
+            south (float): The minimum latitude.
+            west (float): The western longitude edge.
+            north (float): The maximum latitude.
+            east (float): The eastern longitude edge. If east is less than
+                west, the box crosses the 180th meridian.
 
         Returns:
-            list: A list of the five closest cities to the specified point.
+            list: The cities inside the box (edges included), in file order.
         """
-        sorted_cities = sorted(self.cities.keys(), key=lambda city: haversine(point, self.cities[city]))
-        return sorted_cities[:5]
+        if south > north or not self._names:
+            return []
+        (row0, row1), (col0, col1) = grid_cell(np.array([south, north]), np.array([west, east]))
+        if west <= east:
+            spans = [(col0, col1)]
+        elif col1 >= col0:
+            # Both edges fall in the same column, so the two spans would overlap
+            spans = [(0, grid_columns() - 1)]
+        else:
+            spans = [(col0, grid_columns() - 1), (0, col1)]
+
+        slices = []
+        for row in range(row0, row1 + 1):
+            for first, last in spans:
+                start = self._cell_start[row * grid_columns() + first]
+                end = self._cell_start[row * grid_columns() + last + 1]
+                slices.append(self._cell_order[start:end])
+        index = np.sort(np.concatenate(slices))
+
+        lat, lon = self._lat_lon[index, 0], self._lat_lon[index, 1]
+        inside = (lat >= south) & (lat <= north)
+        if west <= east:
+            inside &= (lon >= west) & (lon <= east)
+        else:
+            inside &= (lon >= west) | (lon <= east)
+        return [self._names[i] for i in index[inside].tolist()]
+
+
+class _NameTable:
+    """Sequence of (area, city) names read from a snapshot's string table."""
+
+    def __init__(self, offsets, strings):
+        self._offsets = offsets
+        self._strings = strings
+
+    def __len__(self):
+        return (len(self._offsets) - 1) // 2
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, middle, end = self._offsets[2 * i:2 * i + 3].tolist()
+        return (bytes(self._strings[start:middle]).decode('utf-8'),
+                bytes(self._strings[middle:end]).decode('utf-8'))
+
+
+class _SnapshotCities(Mapping):
+    """Read-only mapping of (area, city) to (lat, lon) backed by a snapshot."""
+
+    def __init__(self, cities):
+        self._cities = cities
+
+    def __getitem__(self, key):
+        return tuple(self._cities._lat_lon[self._cities._find(key)].tolist())
 
-def main(filename, arg1, arg2):
+    def __iter__(self):
+        names = self._cities._names
+        return (names[i] for i in range(len(names)))
+
+    def __len__(self):
+        return len(self._cities._names)
+
+
+def grid_rows():
+    """Return the number of rows of latitude cells in the bounding-box grid."""
+    return int(np.ceil(180 / GRID_DEGREES))
+
+
+def grid_columns():
+    """Return the number of columns of longitude cells in the bounding-box grid."""
+    return int(np.ceil(360 / GRID_DEGREES))
+
+
+def grid_cell(lat, lon):
+    """
+    Find the grid cells containing points.
+
+    Args:
+        lat (numpy.ndarray): Latitudes in decimal degrees.
+        lon (numpy.ndarray): Longitudes in decimal degrees.
+
+    Returns:
+        tuple: Arrays of the row and column of each point's cell. Points
+        outside [-90, 90] x [-180, 180] are clamped to the edge cells.
+    """
+    rows = np.clip(np.floor((lat + 90) / GRID_DEGREES), 0, grid_rows() - 1).astype(int)
+    cols = np.clip(np.floor((lon + 180) / GRID_DEGREES), 0, grid_columns() - 1).astype(int)
+    return rows, cols
+
+
+def haversine_array(lat1, lon1, lat2, lon2):
+    """
+    Compute great-circle distances between arrays of points.
+
+    Uses the same formula and Earth radius as haversine(), with NumPy
+    broadcasting over the inputs.
+
+    Args:
+        lat1, lon1, lat2, lon2 (numpy.ndarray): Latitudes and longitudes in radians.
+
+    Returns:
+        numpy.ndarray: Distances in kilometers.
+    """
+    d = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(d))
+
+
+def to_unit_vectors(lat_lon):
+    """
+    Convert latitudes and longitudes to 3D points on the unit sphere.
+
+    Args:
+        lat_lon (numpy.ndarray): An array of shape (n, 2) of latitudes and longitudes in decimal degrees.
+
+    Returns:
+        numpy.ndarray: An array of shape (n, 3) of x, y, z coordinates.
+    """
+    lat, lon = np.radians(lat_lon[:, 0]), np.radians(lat_lon[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class CityServer:
+    """
+    Answer nearest-city and radius queries over a socket, one JSON object per line.
+
+    Requests look like {"op": "nearest", "lat": 38.99, "lon": -76.94, "k": 5}
+    or {"op": "within", "lat": 38.99, "lon": -76.94, "radius_km": 50}, and
+    each gets a reply of {"cities": [[area, city], ...]} or {"error": message},
+    in the order the requests were sent on that connection. Nearest-city
+    requests that arrive during the same pass of the event loop, from any
+    number of connections, are answered together with one nearest_many() call.
+    """
+
+    def __init__(self, cities):
+        """
+        Initialize the server.
+
+        Args:
+            cities (Cities): The cities to answer queries about.
+        """
+        self.cities = cities
+        self._pending = []
+
+    async def handle(self, reader, writer):
+        """
+        Serve one client connection until it closes.
+
+        Requests are started as soon as they are read, so a client that
+        sends several requests without waiting has them batched together;
+        replies are written in request order.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's input stream.
+            writer (asyncio.StreamWriter): The connection's output stream.
+        """
+        replies = asyncio.Queue()
+
+        async def write_replies():
+            while (reply := await replies.get()) is not None:
+                writer.write(json.dumps(await reply).encode('utf-8') + b"\n")
+                await writer.drain()
+
+        writing = asyncio.ensure_future(write_replies())
+        try:
+            while line := await reader.readline():
+                replies.put_nowait(asyncio.ensure_future(self.answer(line)))
+        finally:
+            replies.put_nowait(None)
+            await writing
+            writer.close()
+
+    async def answer(self, line):
+        """
+        Answer a single request.
+
+        Args:
+            line (bytes): A JSON-encoded request.
+
+        Returns:
+            dict: The reply.
+        """
+        try:
+            request = json.loads(line)
+            point = (float(request["lat"]), float(request["lon"]))
+            if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+                raise ValueError(f"invalid latitude/longitude {point}")
+            if request["op"] == "nearest":
+                future = asyncio.get_running_loop().create_future()
+                self._pending.append((point, int(request.get("k", 5)), future))
+                if len(self._pending) == 1:
+                    asyncio.get_running_loop().call_soon(self._flush)
+                names = await future
+            elif request["op"] == "within":
+                names = self.cities.within(point, float(request["radius_km"]))
+            else:
+                raise ValueError(f"unknown op {request['op']!r}")
+        except (ValueError, KeyError, TypeError) as e:
+            return {"error": str(e)}
+        return {"cities": [list(name) for name in names]}
+
+    def _flush(self):
+        """Answer every pending nearest-city request, batched by k."""
+        pending, self._pending = self._pending, []
+        by_k = {}
+        for point, k, future in pending:
+            by_k.setdefault(k, []).append((point, future))
+        for k, group in by_k.items():
+            results = self.cities.nearest_many([point for point, _ in group], k)
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+async def serve(cities, address):
+    """
+    Run a CityServer until cancelled.
+
+    Args:
+        cities (Cities): The cities to answer queries about.
+        address (str): Either "host:port" to listen on TCP, or the path of a
+            Unix socket.
+    """
+    server = CityServer(cities)
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        listener = await asyncio.start_server(server.handle, host, int(port))
+    else:
+        listener = await asyncio.start_unix_server(server.handle, path=address)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(filename, arg1, arg2, k=5, snapshot=None, address=None):
     """
     Read city data from a file and find the closest cities to a specified location.
 
@@ -40,11 +501,26 @@ def main(filename, arg1, arg2):
         filename (str): Path to a file containing city data.
         arg1 (str): Either the name of an area in the file or a string representation of a latitude.
         arg2 (str): Either the name of a city in the file or a string representation of a longitude.
+        k (int): The number of nearby cities to report (default: 5).
+        snapshot (str or None): If given, also save the cities to this
+            snapshot file, for faster loading next time (default: None).
+        address (str or None): If given, ignore arg1 and arg2 and instead
+            serve queries on this address ("host:port" or a Unix socket
+            path) until interrupted (default: None).
 
     Side effects:
         Writes to stdout.
     """
     cities = Cities(filename)
+    if snapshot is not None:
+        cities.save_snapshot(snapshot)
+    if address is not None:
+        print(f"Serving {len(cities.cities)} cities on {address}")
+        try:
+            asyncio.run(serve(cities, address))
+        except KeyboardInterrupt:
+            pass
+        return
     try:
         lat = float(arg1)
         lon = float(arg2)
@@ -55,7 +531,7 @@ def main(filename, arg1, arg2):
         except KeyError:
             sys.exit(f"Error: could not look up {arg1}, {arg2}")
     print(f"For {arg1}, {arg2}, the nearest cities from the file are:")
-    for result in cities.nearest(point):
+    for result in cities.nearest(point, k):
         print(" " + ", ".join(result))
 
 def parse_args(arglist):
@@ -69,11 +545,17 @@ def parse_args(arglist):
         namespace: A namespace containing the parsed argument values.
     """
     parser = ArgumentParser()
-    parser.add_argument("filename", help="file containing city data")
-    parser.add_argument("arg1", help="a latitude expressed in decimal degrees or an area (state, country) from the file")
-    parser.add_argument("arg2", help="a longitude expressed in decimal degrees or a city name from the file")
-    return parser.parse_args(arglist)
+    parser.add_argument("filename", help="file containing city data, or a snapshot of it")
+    parser.add_argument("arg1", nargs="?", help="a latitude expressed in decimal degrees or an area (state, country) from the file")
+    parser.add_argument("arg2", nargs="?", help="a longitude expressed in decimal degrees or a city name from the file")
+    parser.add_argument("-k", type=int, default=5, help="the number of nearby cities to report (default: 5)")
+    parser.add_argument("-s", "--snapshot", help="save the city data to this binary snapshot file for faster loading")
+    parser.add_argument("--serve", metavar="ADDRESS", help="serve queries on host:port or a Unix socket path instead of answering one")
+    args = parser.parse_args(arglist)
+    if args.serve is None and args.arg2 is None:
+        parser.error("arg1 and arg2 are required unless --serve is given")
+    return args
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.filename, args.arg1, args.arg2)
+    main(args.filename, args.arg1, args.arg2, args.k, args.snapshot, args.serve)
@@ -0,0 +1,173 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import tempfile
+
+from haversine import haversine
+
+from ArrayFile import read_arrays
+
+spec = importlib.util.spec_from_file_location(
+    "geographic_cities", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Geographic Cities.py"))
+geographic_cities = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(geographic_cities)
+Cities = geographic_cities.Cities
+
+
+def write_cities(directory, count=2000, seed=0):
+    """Write a file of random cities, including some duplicate positions, and return its path."""
+    rng = random.Random(seed)
+    path = os.path.join(directory, "cities.csv")
+    with open(path, "w") as file:
+        for i in range(count):
+            if i % 50 == 49:
+                latitude, longitude = last  # a tie with the previous city
+            else:
+                latitude, longitude = round(rng.uniform(-90, 90), 4), round(rng.uniform(-180, 180), 4)
+            last = latitude, longitude
+            file.write(f"A{i % 40},C{i},{latitude},{longitude}\n")
+    return path
+
+def brute_force_nearest(cities, point, k):
+    """The nearest cities found by sorting every city by haversine distance."""
+    return sorted(cities.cities, key=lambda city: haversine(point, cities.cities[city]))[:k]
+
+def random_points(count, seed=1):
+    rng = random.Random(seed)
+    return [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(count)]
+
+def test_nearest_matches_brute_force():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        for point in random_points(100):
+            for k in (1, 5, 20):
+                assert cities.nearest(point, k) == brute_force_nearest(cities, point, k)
+
+def test_nearest_many_matches_brute_force():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        points = random_points(100, seed=2)
+        assert cities.nearest_many(points, 5) == [brute_force_nearest(cities, point, 5) for point in points]
+        assert cities.nearest_many(points, 3, block_size=7) == [cities.nearest(point, 3) for point in points]
+        assert cities.nearest_many([], 5) == []
+
+def brute_force_in_bbox(cities, south, west, north, east):
+    """The cities inside a bounding box, found by checking every city."""
+    def inside(lat, lon):
+        if west <= east:
+            in_lon = west <= lon <= east
+        else:
+            in_lon = lon >= west or lon <= east
+        return south <= lat <= north and in_lon
+    return [city for city, (lat, lon) in cities.cities.items() if inside(lat, lon)]
+
+def test_within_matches_brute_force():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        rng = random.Random(4)
+        for point in random_points(50, seed=4):
+            radius = rng.uniform(0, 3000)
+            expected = [city for city in brute_force_nearest(cities, point, len(cities.cities))
+                        if haversine(point, cities.cities[city]) <= radius]
+            assert cities.within(point, radius) == expected
+        assert cities.within((0, 0), -1) == []
+
+def test_in_bbox_matches_brute_force():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        rng = random.Random(5)
+        boxes = [(-11.91, 23.68, 86.55, 23.27), (-90, -180, 90, 180), (10, 170, 40, -170), (5, 5, 1, 10)]
+        for _ in range(100):
+            south, north = sorted(rng.uniform(-90, 90) for _ in range(2))
+            boxes.append((south, rng.uniform(-180, 180), north, rng.uniform(-180, 180)))
+        # Boxes crossing the 180th meridian whose west and east edges share a grid column
+        for lat, lon in list(cities.cities.values())[:20]:
+            boxes.append((lat - 5, lon, lat + 5, lon - 1e-6))
+        for box in boxes:
+            assert cities.in_bbox(*box) == brute_force_in_bbox(cities, *box)
+
+def test_snapshot_matches_source():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        snapshot_path = os.path.join(directory, "cities.snap")
+        cities.save_snapshot(snapshot_path)
+        snapshot = Cities(snapshot_path)
+        assert list(snapshot.cities) == list(cities.cities)
+        assert all(snapshot.cities[city] == cities.cities[city] for city in cities.cities)
+        assert ("no such area", "no such city") not in snapshot.cities
+        assert snapshot.in_bbox(10, 170, 40, -170) == cities.in_bbox(10, 170, 40, -170)
+        for point in random_points(50, seed=3):
+            assert snapshot.nearest(point, 5) == brute_force_nearest(cities, point, 5)
+            assert snapshot.within(point, 500) == cities.within(point, 500)
+
+def test_snapshot_holds_plain_arrays():
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "cities.snap")
+        Cities(write_cities(directory, count=100)).save_snapshot(snapshot_path)
+        _, arrays = read_arrays(snapshot_path, geographic_cities.SNAPSHOT_MAGIC)
+        assert all(array.dtype.kind in "iuf" for array in arrays.values())
+        assert "tree" not in arrays
+
+async def query_server(cities, path, connections):
+    """Start serve() on a Unix socket, send each connection's requests without waiting, and return the replies."""
+    server = asyncio.ensure_future(geographic_cities.serve(cities, path))
+    try:
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+
+        async def send(requests):
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b"".join(request.encode("utf-8") + b"\n" for request in requests))
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            await writer.wait_closed()
+            return replies
+
+        replies = await asyncio.gather(*(send(requests) for requests in connections))
+        # Let the server's connection handlers see end-of-file before it is cancelled
+        while len(asyncio.all_tasks()) > 2:
+            await asyncio.sleep(0.01)
+        return replies
+    finally:
+        server.cancel()
+
+def test_server_answers_in_order():
+    with tempfile.TemporaryDirectory() as directory:
+        cities = Cities(write_cities(directory))
+        points = random_points(20, seed=5)
+        connections = [
+            [json.dumps({"op": "nearest", "lat": lat, "lon": lon, "k": k}) for lat, lon in points[:10] for k in (1, 4)],
+            [json.dumps({"op": "nearest", "lat": lat, "lon": lon}) for lat, lon in points[10:]] + [
+                json.dumps({"op": "within", "lat": points[0][0], "lon": points[0][1], "radius_km": 800}),
+                json.dumps({"op": "nearest", "lat": 91, "lon": 0}),
+                json.dumps({"op": "teleport", "lat": 0, "lon": 0}),
+                json.dumps({"op": "within", "lat": 0, "lon": 0}),
+                "not json",
+            ],
+        ]
+        batches = []
+        nearest_many = cities.nearest_many
+        cities.nearest_many = lambda points, k: batches.append(len(points)) or nearest_many(points, k)
+        first, second = asyncio.run(query_server(cities, os.path.join(directory, "cities.sock"), connections))
+
+        assert first == [{"cities": [list(name) for name in cities.nearest(point, k)]}
+                         for point in points[:10] for k in (1, 4)]
+        assert second[:10] == [{"cities": [list(name) for name in cities.nearest(point, 5)]} for point in points[10:]]
+        assert second[10] == {"cities": [list(name) for name in cities.within(points[0], 800)]}
+        assert all(list(reply) == ["error"] for reply in second[11:])
+        # Pipelined nearest-city requests are answered in batches
+        assert sum(batches) == 30 and len(batches) < 30
+
+
+if __name__ == "__main__":
+    test_nearest_matches_brute_force()
+    test_nearest_many_matches_brute_force()
+    test_within_matches_brute_force()
+    test_in_bbox_matches_brute_force()
+    test_snapshot_matches_source()
+    test_snapshot_holds_plain_arrays()
+    test_server_answers_in_order()
+    print("All tests passed!")
@@ -3,6 +3,8 @@ import re
 class Book:
     """A class to represent a book with call number, title, and author."""
 
+    __slots__ = ("_callnum", "title", "author", "_key")
+
     def __init__(self, callnum, title, author):
         """
         Initialize the Book class.
@@ -16,6 +18,16 @@ class Book:
         self.title = title
         self.author = author
 
+    @property
+    def callnum(self):
+        """str: The call number; setting it discards the cached sort key."""
+        return self._callnum
+
+    @callnum.setter
+    def callnum(self, callnum):
+        self._callnum = callnum
+        self._key = None
+
     def __lt__(self, other):
         """
         Compare two instances of Book based on their call numbers.
@@ -41,6 +53,19 @@ class Book:
         """
         Return a tuple representing the sort key for the book's call number.
 
+        The call number is parsed the first time only.
+
+        Returns:
+            tuple: A tuple representing the sort key for the book's call number.
+        """
+        if self._key is None:
+            self._key = self._parse_callnum()
+        return self._key
+
+    def _parse_callnum(self):
+        """
+        Parse the book's call number into its sort key.
+
         Returns:
             tuple: A tuple representing the sort key for the book's call number.
         """
@@ -74,7 +99,7 @@ def read_books(filename):
 
 def print_books(books):
     """ Print information about each book, in order. """
-    for book in sorted(books):
+    for book in sorted(books, key=Book.sort_key):
         print(book)
 
 def main(filename):
@@ -0,0 +1,74 @@
+import contextlib
+import importlib.util
+import io
+import itertools
+import os
+import random
+
+
+def load(filename, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)), filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+call_number_library = load("CallNumber Library.py", "call_number_library")
+library_call_numbers = load("Library Call Numbers.py", "library_call_numbers")
+ppatel_library = load("PPatel_library.py", "ppatel_library")
+
+# Call numbers in Library of Congress order
+LC_ORDER = ["B2430.D484 F47 2004", "HQ1075.5.U6 S66 2010", "QA9.5 .B3 1999", "QA76 2013", "QA76 .A1 2000",
+            "QA76.5.C6 2001", "QA76.73.P98 L88 2013", "QA76.73.P98 L9 2010", "QA76.73.P98 M35 2012",
+            "QA76.9.D3 S5 2005", "QA76.9.D3 S52 2001", "QA100.B5 1990", "QC21.3 .H35 2014",
+            "Z665.2.U6 A1 1995"]
+
+
+def shuffled_books(module, seed=0):
+    callnums = LC_ORDER[:]
+    random.Random(seed).shuffle(callnums)
+    return [module.Book(callnum, f"Title {callnum}", "") for callnum in callnums]
+
+def test_sorting_follows_lc_order():
+    for module in (call_number_library, ppatel_library):
+        for seed in range(10):
+            books = shuffled_books(module, seed)
+            assert [book.callnum for book in sorted(books)] == LC_ORDER
+            assert [book.callnum for book in sorted(books, key=module.Book.sort_key)] == LC_ORDER
+
+def test_years_are_not_cutters():
+    assert call_number_library.Book("QA76 2013", "", "").sort_key() == ("QA", 76.0, "", 0, "", 0, "2013")
+    assert ppatel_library.Book("", "", "").parse_callnum("QA76 2013") == ["QA", 76.0, "", 0, "", 0, "2013"]
+    assert call_number_library.Book("QA76.73.P98 L88 2013", "", "").sort_key() == \
+        ("QA", 76.73, "P", 0.98, "L", 0.88, "2013")
+
+def test_sort_key_matches_compare_callnum():
+    callnums = LC_ORDER + ["XYZ", "QA76.73.P98 L88 2013", "QA76.73.P98 L88", "12", ""]
+    book = ppatel_library.Book("", "", "")
+    for first, second in itertools.product(callnums, callnums):
+        assert book.compare_callnum(first, second) == \
+            (ppatel_library.Book(first, "", "") < ppatel_library.Book(second, "", ""))
+
+def test_sort_key_follows_callnum_changes():
+    for module in (call_number_library, library_call_numbers, ppatel_library):
+        first, second = module.Book("QA100.B5 1990", "", ""), module.Book("QA76 .A1 2000", "", "")
+        assert second < first
+        second.callnum = "Z665.2.U6 A1 1995"
+        assert first < second
+        assert not hasattr(first, "__dict__")
+
+def test_print_books_sorts():
+    for module in (call_number_library, library_call_numbers, ppatel_library):
+        books = shuffled_books(module)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            module.print_books(books)
+        assert output.getvalue().splitlines() == [repr(book) for book in sorted(books)]
+
+
+if __name__ == "__main__":
+    test_sorting_follows_lc_order()
+    test_years_are_not_cutters()
+    test_sort_key_matches_compare_callnum()
+    test_sort_key_follows_callnum_changes()
+    test_print_books_sorts()
+    print("All tests passed!")
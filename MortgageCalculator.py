@@ -1,6 +1,24 @@
 from argparse import ArgumentParser
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
 import math
+from multiprocessing import Pool
 import sys
+import time
+
+import numpy as np
+
+NEVER_PAID_OFF = -1  # payment count reported when a payment does not cover the interest
+INVALID_LOAN = -2  # payment count reported when a balance, rate or payment is not a finite number
+
+LOAN_COLUMNS = ("principal", "rate", "years", "per_year", "target_payment")
+RESULT_COLUMNS = ("loan", "rate_shock", "extra_payment", "rate", "min_payment", "payment", "payments")
+BATCH_CHUNK = 100000  # loans per chunk handed to a worker
+
+SCHEDULE_COLUMNS = ("loan", "number", "payment", "interest", "principal", "balance")
+SCHEDULE_DTYPE = np.dtype([("loan", "<i8"), ("number", "<i8"), ("payment", "<f8"),
+                           ("interest", "<f8"), ("principal", "<f8"), ("balance", "<f8")])
 
 
 def get_min_payment(total_amount, annual_interest_rate, years, num_payments_per_year):
@@ -18,10 +36,39 @@ def get_min_payment(total_amount, annual_interest_rate, years, num_payments_per_
     """
     interest_rate_per_payment = annual_interest_rate / num_payments_per_year
     total_payments = years * num_payments_per_year
+    if interest_rate_per_payment == 0:
+        return math.ceil(total_amount / total_payments)
     payment_amount = total_amount * (interest_rate_per_payment * math.pow(1 + interest_rate_per_payment, total_payments)) / (math.pow(1 + interest_rate_per_payment, total_payments) - 1)
     return math.ceil(payment_amount)
 
 
+def get_min_payment_array(total_amounts, annual_interest_rates, years, num_payments_per_year):
+    """Compute the minimum payments of many mortgages at once.
+
+    The arguments are broadcast against each other and the same formula as
+    get_min_payment() is evaluated element by element, so the results
+    match it exactly, including the interest-free case of the principal
+    spread evenly over the term.
+
+    Args:
+        total_amounts (array-like of float): The total amounts of the mortgages.
+        annual_interest_rates (array-like of float): The annual interest rates as decimals.
+        years (array-like of int): The terms of the mortgages in years.
+        num_payments_per_year (array-like of int): The numbers of payments per year.
+
+    Returns:
+        numpy.ndarray of float: The minimum payment of each mortgage.
+
+    """
+    total_payments = np.multiply(years, num_payments_per_year).astype(float)
+    total_amounts = np.asarray(total_amounts, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        rate = np.asarray(annual_interest_rates, dtype=float) / num_payments_per_year
+        growth = np.power(1 + rate, total_payments)
+        return np.ceil(np.where(rate == 0, total_amounts / total_payments,
+                                total_amounts * (rate * growth) / (growth - 1)))
+
+
 def interest_due(balance, annual_interest_rate, num_payments_per_year):
     """Compute the amount of interest due in the next payment.
 
@@ -41,6 +88,35 @@ def interest_due(balance, annual_interest_rate, num_payments_per_year):
 def remaining_payments(balance, annual_interest_rate, target_payment, num_payments_per_year):
     """Compute the number of payments required to pay off the mortgage.
 
+    The count comes from the closed-form solution of the amortization
+    recurrence, so it takes constant time. When the balance after the
+    last payment (or before it) is so close to zero that rounding could
+    change the answer, the payments are simulated one by one instead, so
+    the result always matches a step-by-step calculation.
+
+    Args:
+        balance (float): The balance of the mortgage.
+        annual_interest_rate (float): The annual interest rate as a decimal.
+        target_payment (float): The amount the user wants to pay per payment.
+        num_payments_per_year (int): The number of payments per year.
+
+    Returns:
+        int: The number of payments required.
+
+    Raises:
+        ValueError: the payment does not cover the interest, so the mortgage is never paid off.
+    """
+    count = payment_count(balance, annual_interest_rate / num_payments_per_year, target_payment)
+    if count is None:
+        count = simulate_payments(balance, annual_interest_rate, target_payment, num_payments_per_year)
+    elif count == NEVER_PAID_OFF:
+        raise ValueError("Target payment does not cover the interest due")
+    return count
+
+
+def simulate_payments(balance, annual_interest_rate, target_payment, num_payments_per_year):
+    """Count payments until the mortgage is paid off by simulating each one.
+
     Args:
         balance (float): The balance of the mortgage.
         annual_interest_rate (float): The annual interest rate as a decimal.
@@ -59,7 +135,398 @@ def remaining_payments(balance, annual_interest_rate, target_payment, num_paymen
     return counter
 
 
-def main(total_amount, annual_interest_rate, years=30, num_payments_per_year=12, target_payment=None):
+def payment_count(balance, rate, payment):
+    """Solve for the number of payments with the closed-form formula.
+
+    After n payments the balance is (B - P/r)(1 + r)**n + P/r, so the loan
+    is paid off after ceil(log(P / (P - r*B)) / log(1 + r)) payments
+    (or ceil(B / P) when r is 0).
+
+    Arguments:
+        balance (float): The balance of the mortgage.
+        rate (float): The interest rate per payment.
+        payment (float): The amount paid per payment.
+
+    Returns:
+        int or None: The number of payments, NEVER_PAID_OFF if the payment
+        does not cover the interest, or None if the answer is too close to
+        call without simulating.
+
+    """
+    if balance <= 0:
+        return 0
+    if payment <= balance * rate:
+        return NEVER_PAID_OFF
+    if rate == 0:
+        count = math.ceil(balance / payment)
+    else:
+        count = math.ceil(math.log(payment / (payment - rate * balance)) / math.log1p(rate))
+    count = max(count, 1)
+
+    # Nudge the estimate so the balance after count payments is the first
+    # one at or below zero, then check neither side is within rounding of zero.
+    while _balance_after(balance, rate, payment, count) > 0:
+        count += 1
+    while count > 1 and _balance_after(balance, rate, payment, count - 1) <= 0:
+        count -= 1
+    tolerance = 1e-9 * _balance_scale(balance, rate, payment, count)
+    if (abs(_balance_after(balance, rate, payment, count)) <= tolerance
+            or abs(_balance_after(balance, rate, payment, count - 1)) <= tolerance):
+        return None
+    return count
+
+
+def _balance_after(balance, rate, payment, count):
+    """Return the balance left after count payments (works on scalars or arrays)."""
+    rate = np.asarray(rate, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compounded = (balance - payment / rate) * (1 + rate) ** count + payment / rate
+    return np.where(rate == 0, balance - count * payment, compounded)
+
+
+def _balance_scale(balance, rate, payment, count):
+    """Return the size of the terms summed by _balance_after, for judging rounding error."""
+    rate = np.asarray(rate, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compounded = np.abs(balance - payment / rate) * (1 + rate) ** count + payment / rate
+    return np.where(rate == 0, balance + count * payment, compounded)
+
+
+def remaining_payments_array(balances, annual_interest_rates, target_payments, num_payments_per_year):
+    """Compute the number of payments required for many mortgages at once.
+
+    The arguments are broadcast against each other, and the closed-form
+    solution is evaluated for every element with NumPy. Elements whose
+    answer is too close to call are simulated one by one, so every count
+    matches remaining_payments(). Elements with a balance, rate or payment
+    that is not a finite number (NaN or infinite) are not evaluated.
+
+    Args:
+        balances (array-like of float): The balances of the mortgages.
+        annual_interest_rates (array-like of float): The annual interest rates as decimals.
+        target_payments (array-like of float): The amounts paid per payment.
+        num_payments_per_year (array-like of int): The numbers of payments per year.
+
+    Returns:
+        numpy.ndarray of int: The number of payments required for each
+        mortgage, NEVER_PAID_OFF where the payment does not cover the
+        interest, or INVALID_LOAN where an input is not finite.
+
+    """
+    balance, annual_rate, payment, per_year = np.broadcast_arrays(
+        np.asarray(balances, dtype=float), np.asarray(annual_interest_rates, dtype=float),
+        np.asarray(target_payments, dtype=float), np.asarray(num_payments_per_year))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = annual_rate / per_year
+    counts = np.zeros(balance.shape, dtype=np.int64)
+
+    invalid = ~(np.isfinite(balance) & np.isfinite(rate) & np.isfinite(payment))
+    never = ~invalid & (balance > 0) & (payment <= balance * rate)
+    active = ~invalid & (balance > 0) & ~never
+    b, r, p = balance[active], rate[active], payment[active]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimate = np.where(r == 0, np.ceil(b / p),
+                            np.ceil(np.log(p / (p - r * b)) / np.log1p(r)))
+    n = np.maximum(estimate, 1).astype(np.int64)
+
+    # Same off-by-one corrections as payment_count(), applied to every element
+    while True:
+        low = _balance_after(b, r, p, n) > 0
+        if not low.any():
+            break
+        n += low
+    while True:
+        high = (n > 1) & (_balance_after(b, r, p, n - 1) <= 0)
+        if not high.any():
+            break
+        n -= high
+
+    tolerance = 1e-9 * _balance_scale(b, r, p, n)
+    unclear = ((np.abs(_balance_after(b, r, p, n)) <= tolerance)
+               | (np.abs(_balance_after(b, r, p, n - 1)) <= tolerance))
+    for i in np.flatnonzero(unclear):
+        n[i] = simulate_payments(b[i], annual_rate[active][i], p[i], per_year[active][i])
+
+    counts[active] = n
+    counts[never] = NEVER_PAID_OFF
+    counts[invalid] = INVALID_LOAN
+    return counts
+
+
+def amortization_schedule(balance, annual_interest_rate, target_payment, num_payments_per_year):
+    """Generate the payment schedule of a mortgage, one payment at a time.
+
+    Each payment first covers the interest due and the rest goes to the
+    principal, exactly as in simulate_payments(); the final payment is
+    reduced to what is left, so the schedule ends at a balance of zero.
+
+    Args:
+        balance (float): The balance of the mortgage.
+        annual_interest_rate (float): The annual interest rate as a decimal.
+        target_payment (float): The amount the user wants to pay per payment.
+        num_payments_per_year (int): The number of payments per year.
+
+    Yields:
+        tuple: (number, payment, interest, principal, balance) for each
+        payment, numbered from 1, where balance is what remains after it.
+
+    Raises:
+        ValueError: the payment does not cover the interest, so the mortgage is never paid off.
+    """
+    if balance > 0 and target_payment <= interest_due(balance, annual_interest_rate, num_payments_per_year):
+        raise ValueError("Target payment does not cover the interest due")
+    number = 0
+    while balance > 0:
+        number += 1
+        interest = interest_due(balance, annual_interest_rate, num_payments_per_year)
+        principal = target_payment - interest
+        if principal >= balance:
+            yield number, balance + interest, interest, balance, 0.0
+            return
+        balance -= principal
+        yield number, target_payment, interest, principal, balance
+
+
+def schedule_arrays(balances, annual_interest_rates, target_payments, num_payments_per_year):
+    """Compute the payment schedules of many mortgages as NumPy columns.
+
+    The number of payments for each mortgage is found first with
+    remaining_payments_array(), so every column is allocated once at its
+    final size; the schedules are then filled in one payment number at a
+    time for all mortgages still being paid. Rows are grouped by mortgage,
+    in payment order, and hold the same values amortization_schedule()
+    yields. Mortgages that are never paid off, or whose numbers are not
+    finite, have no rows.
+
+    Args:
+        balances (array-like of float): The balances of the mortgages.
+        annual_interest_rates (array-like of float): The annual interest rates as decimals.
+        target_payments (array-like of float): The amounts paid per payment.
+        num_payments_per_year (array-like of int): The numbers of payments per year.
+
+    Returns:
+        dict: maps each name in SCHEDULE_COLUMNS to an array; "loan" is the
+        position of the mortgage in the (broadcast) inputs.
+    """
+    balance, annual_rate, payment, per_year = (
+        a.ravel().copy() for a in np.broadcast_arrays(
+            np.asarray(balances, dtype=float), np.asarray(annual_interest_rates, dtype=float),
+            np.asarray(target_payments, dtype=float), np.asarray(num_payments_per_year)))
+    rate = annual_rate / per_year
+    counts = np.maximum(remaining_payments_array(balance, annual_rate, payment, per_year), 0)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+    total = int(counts.sum())
+    columns = {name: np.empty(total, dtype=SCHEDULE_DTYPE[name]) for name in SCHEDULE_COLUMNS}
+    columns["loan"][:] = np.repeat(np.arange(len(counts)), counts)
+    columns["number"][:] = np.arange(total) - np.repeat(starts, counts) + 1
+
+    active = np.flatnonzero(counts > 0)
+    number = 0
+    while len(active):
+        rows = starts[active] + number
+        interest = balance[active] * rate[active]
+        principal = payment[active] - interest
+        last = principal >= balance[active]
+        paid = np.where(last, balance[active] + interest, payment[active])
+        principal = np.where(last, balance[active], principal)
+        balance[active] = np.where(last, 0.0, balance[active] - principal)
+
+        columns["payment"][rows] = paid
+        columns["interest"][rows] = interest
+        columns["principal"][rows] = principal
+        columns["balance"][rows] = balance[active]
+        number += 1
+        active = active[number < counts[active]]
+    return columns
+
+
+def write_schedules(file, balances, annual_interest_rates, target_payments, num_payments_per_year,
+                    binary=False, chunk_size=10000):
+    """Write the payment schedules of many mortgages to a file.
+
+    Mortgages are processed chunk_size at a time with schedule_arrays(),
+    and each chunk is written straight from its arrays, so memory use
+    depends on the chunk size rather than on the size of the portfolio.
+
+    Args:
+        file (file object): Where to write; opened in text mode for CSV or
+            binary mode if binary is true.
+        balances, annual_interest_rates, target_payments, num_payments_per_year:
+            As for schedule_arrays().
+        binary (bool, optional): Write packed SCHEDULE_DTYPE records instead
+            of CSV with a header line (default: False).
+        chunk_size (int, optional): Number of mortgages per chunk (default: 10000).
+
+    Returns:
+        int: The number of schedule rows written.
+    """
+    arrays = [a.ravel() for a in np.broadcast_arrays(
+        np.asarray(balances, dtype=float), np.asarray(annual_interest_rates, dtype=float),
+        np.asarray(target_payments, dtype=float), np.asarray(num_payments_per_year))]
+    if not binary:
+        file.write(",".join(SCHEDULE_COLUMNS) + "\n")
+
+    written = 0
+    for start in range(0, len(arrays[0]), chunk_size):
+        columns = schedule_arrays(*(a[start:start + chunk_size] for a in arrays))
+        columns["loan"] += start
+        records = np.empty(len(columns["loan"]), dtype=SCHEDULE_DTYPE)
+        for name in SCHEDULE_COLUMNS:
+            records[name] = columns[name]
+        if binary:
+            file.write(records.tobytes())
+        else:
+            np.savetxt(file, records, fmt="%d,%d,%.2f,%.2f,%.2f,%.2f")
+        written += len(records)
+    return written
+
+
+def read_loans(file, chunk_size=BATCH_CHUNK):
+    """Read a loan file in chunks of NumPy arrays.
+
+    The file is CSV with a header line and the columns in LOAN_COLUMNS. The
+    target payment may be left empty, in which case it is NaN and the
+    minimum payment is used.
+
+    Args:
+        file (file object): The open loan file.
+        chunk_size (int, optional): Number of loans per chunk (default: BATCH_CHUNK).
+
+    Yields:
+        dict: maps each name in LOAN_COLUMNS to an array of at most chunk_size values.
+    """
+    next(file, None)
+    while True:
+        lines = list(islice(file, chunk_size))
+        if not lines:
+            return
+        table = np.loadtxt(lines, delimiter=",", ndmin=2, usecols=range(len(LOAN_COLUMNS)),
+                           converters={4: lambda s: float(s) if s.strip() else math.nan})
+        yield dict(zip(LOAN_COLUMNS, table.T))
+
+
+def evaluate_scenarios(loans, rate_shocks=(0.0,), extra_payments=(0.0,)):
+    """Evaluate a grid of scenarios for a chunk of loans.
+
+    Every loan is evaluated under every combination of a rate shock (added
+    to its annual interest rate) and an extra payment (added to its target
+    payment, or to its minimum payment at the original rate if it has no
+    target). The payment counts come from remaining_payments_array().
+
+    Args:
+        loans (dict): A chunk of loans, as yielded by read_loans().
+        rate_shocks (sequence of float, optional): Changes to the annual interest rate (default: no change).
+        extra_payments (sequence of float, optional): Amounts added to each payment (default: none).
+
+    Returns:
+        dict: maps each name in RESULT_COLUMNS to an array with one element
+        per loan and scenario, ordered by loan and then by scenario. "loan"
+        is the position of the loan in the chunk, and "payments" is
+        NEVER_PAID_OFF where the payment does not cover the interest or
+        INVALID_LOAN where the loan's numbers are not finite.
+    """
+    shock, extra = (a.ravel() for a in np.meshgrid(rate_shocks, extra_payments, indexing="ij"))
+    base = loans["target_payment"]
+    base = np.where(np.isnan(base), get_min_payment_array(
+        loans["principal"], loans["rate"], loans["years"], loans["per_year"]), base)
+
+    def grid(column):
+        return np.repeat(column, len(shock))
+
+    rate = grid(loans["rate"]) + np.tile(shock, len(base))
+    payment = grid(base) + np.tile(extra, len(base))
+    return {
+        "loan": grid(np.arange(len(base))),
+        "rate_shock": np.tile(shock, len(base)),
+        "extra_payment": np.tile(extra, len(base)),
+        "rate": rate,
+        "min_payment": get_min_payment_array(grid(loans["principal"]), rate,
+                                             grid(loans["years"]), grid(loans["per_year"])),
+        "payment": payment,
+        "payments": remaining_payments_array(grid(loans["principal"]), rate, payment, grid(loans["per_year"])),
+    }
+
+
+def _evaluate_chunk(task):
+    """Evaluate one chunk in a worker process and time it."""
+    start = time.perf_counter()
+    results = evaluate_scenarios(*task)
+    return results, len(task[0]["principal"]), time.perf_counter() - start
+
+
+def run_batch(loan_file, out_file, rate_shocks=(0.0,), extra_payments=(0.0,), workers=1,
+              chunk_size=BATCH_CHUNK):
+    """Evaluate a scenario grid for every loan in a loan file.
+
+    Chunks of loans are read with read_loans(), evaluated by
+    evaluate_scenarios() (in a process pool if workers is more than 1),
+    and each chunk of results is written as CSV as soon as it is ready, in
+    the order of the loan file. At most two chunks per worker are submitted
+    but not yet written, so if writing is slower than computing the pool
+    waits rather than piling up results in memory.
+
+    Args:
+        loan_file (file object): The open loan file.
+        out_file (file object): Where to write the results, with a header line.
+        rate_shocks (sequence of float, optional): Changes to the annual interest rate (default: no change).
+        extra_payments (sequence of float, optional): Amounts added to each payment (default: none).
+        workers (int, optional): Number of processes to use (default: 1).
+        chunk_size (int, optional): Number of loans per chunk (default: BATCH_CHUNK).
+
+    Returns:
+        dict: the number of "loans" and "results", and the seconds spent
+        in each stage: "read", "compute" (summed over the workers),
+        "write" and "total".
+    """
+    stats = dict.fromkeys(("loans", "results"), 0)
+    stats.update(dict.fromkeys(("read", "compute", "write"), 0.0))
+    start = time.perf_counter()
+
+    def tasks():
+        chunks = read_loans(loan_file, chunk_size)
+        while True:
+            read_start = time.perf_counter()
+            loans = next(chunks, None)
+            stats["read"] += time.perf_counter() - read_start
+            if loans is None:
+                return
+            yield loans, rate_shocks, extra_payments
+
+    def results(pool):
+        if pool is None:
+            yield from map(_evaluate_chunk, tasks())
+            return
+        pending = deque()
+        for task in tasks():
+            pending.append(pool.apply_async(_evaluate_chunk, (task,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    out_file.write(",".join(RESULT_COLUMNS) + "\n")
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        for columns, loans, seconds in results(pool):
+            write_start = time.perf_counter()
+            columns["loan"] += stats["loans"]
+            np.savetxt(out_file, np.column_stack([columns[name] for name in RESULT_COLUMNS]),
+                       fmt="%d,%.6g,%.2f,%.6g,%.0f,%.2f,%d")
+            stats["write"] += time.perf_counter() - write_start
+            stats["compute"] += seconds
+            stats["loans"] += loans
+            stats["results"] += len(columns["loan"])
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    stats["total"] = time.perf_counter() - start
+    return stats
+
+
+def main(total_amount, annual_interest_rate, years=30, num_payments_per_year=12, target_payment=None,
+         schedule=False):
     """Perform fixed-rate mortgage calculations.
 
     Args:
@@ -68,6 +535,7 @@ def main(total_amount, annual_interest_rate, years=30, num_payments_per_year=12,
         years (int, optional): The term of the mortgage in years (default: 30).
         num_payments_per_year (int, optional): The number of payments per year (default: 12).
         target_payment (float or None, optional): The amount the user wants to pay per payment (default: None).
+        schedule (bool, optional): Whether to also print the payment schedule as CSV (default: False).
 
     """
     min_payment = get_min_payment(total_amount, annual_interest_rate, years, num_payments_per_year)
@@ -81,6 +549,10 @@ def main(total_amount, annual_interest_rate, years=30, num_payments_per_year=12,
     else:
         total_payments = remaining_payments(total_amount, annual_interest_rate, target_payment, num_payments_per_year)
         print(f"If you make payments of ${target_payment}, you will pay off the mortgage in {total_payments} payments.")
+        if schedule:
+            print(",".join(SCHEDULE_COLUMNS[1:]))
+            for row in amortization_schedule(total_amount, annual_interest_rate, target_payment, num_payments_per_year):
+                print("%d,%.2f,%.2f,%.2f,%.2f" % row)
 
 
 def parse_args(arglist):
@@ -103,6 +575,7 @@ def parse_args(arglist):
     parser.add_argument("-n", "--num_payments_per_year", type=int, default=12,
                         help="The number of payments per year (default: 12)")
     parser.add_argument("-p", "--target_payment", type=float, help="The amount you want to pay per payment (default: the minimum payment)")
+    parser.add_argument("-s", "--schedule", action="store_true", help="Print the payment schedule as CSV")
     args = parser.parse_args(arglist)
 
     if args.total_amount < 0:
@@ -119,6 +592,72 @@ def parse_args(arglist):
     return args
 
 
+def batch_main(loan_filename, out_filename=None, rate_shocks=(0.0,), extra_payments=(0.0,), workers=1,
+               chunk_size=BATCH_CHUNK):
+    """Evaluate scenarios for a whole loan file and report the time taken.
+
+    Args:
+        loan_filename (str): Path to the loan file (see read_loans()).
+        out_filename (str or None, optional): Where to write the results (default: standard output).
+        rate_shocks (sequence of float, optional): Changes to the annual interest rate (default: no change).
+        extra_payments (sequence of float, optional): Amounts added to each payment (default: none).
+        workers (int, optional): Number of processes to use (default: 1).
+        chunk_size (int, optional): Number of loans per chunk (default: BATCH_CHUNK).
+
+    """
+    with open(loan_filename, encoding="utf-8") as loan_file, \
+            (open(out_filename, "w", encoding="utf-8") if out_filename else nullcontext(sys.stdout)) as out_file:
+        stats = run_batch(loan_file, out_file, rate_shocks, extra_payments, workers, chunk_size)
+    print(f"{stats['loans']} loans, {stats['results']} results in {stats['total']:.3f}s "
+          f"(read {stats['read']:.3f}s, compute {stats['compute']:.3f}s, write {stats['write']:.3f}s)",
+          file=sys.stderr)
+
+
+def parse_batch_args(arglist):
+    """Parse the command-line arguments of the batch mode.
+
+    Args:
+        arglist (list of str): The arguments after "batch".
+
+    Returns:
+        namespace: The parsed arguments.
+
+    Raises:
+        ValueError: encountered an invalid argument.
+    """
+    parser = ArgumentParser(prog="MortgageCalculator.py batch")
+    parser.add_argument("loan_file", help="CSV file of loans with columns " + ", ".join(LOAN_COLUMNS))
+    parser.add_argument("-o", "--output", help="Where to write the results (default: standard output)")
+    parser.add_argument("-r", "--rate_shocks", type=float, nargs="+", default=[0.0],
+                        help="Changes to the annual interest rate to evaluate (default: 0)")
+    parser.add_argument("-e", "--extra_payments", type=float, nargs="+", default=[0.0],
+                        help="Extra amounts per payment to evaluate (default: 0)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of processes to use (default: 1)")
+    parser.add_argument("-c", "--chunk_size", type=int, default=BATCH_CHUNK,
+                        help=f"Number of loans per chunk (default: {BATCH_CHUNK})")
+    args = parser.parse_args(arglist)
+
+    if args.workers < 1:
+        raise ValueError("Number of workers must be positive")
+    if args.chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+
+    return args
+
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["batch"]:
+        try:
+            args = parse_batch_args(sys.argv[2:])
+        except ValueError as e:
+            sys.exit(str(e))
+        batch_main(args.loan_file, args.output, args.rate_shocks, args.extra_payments, args.workers,
+                   args.chunk_size)
+        sys.exit()
     try:
         args = parse_args(sys.argv[1:])
+    except ValueError as e:
+        sys.exit(str(e))
+    main(args.total_amount, args.annual_interest_rate, years=args.years,
+         num_payments_per_year=args.num_payments_per_year, target_payment=args.target_payment,
+         schedule=args.schedule)
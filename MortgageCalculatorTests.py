@@ -0,0 +1,196 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import warnings
+
+import numpy as np
+
+from MortgageCalculator import (INVALID_LOAN, LOAN_COLUMNS, NEVER_PAID_OFF, RESULT_COLUMNS, SCHEDULE_COLUMNS,
+                                SCHEDULE_DTYPE, amortization_schedule, batch_main, get_min_payment,
+                                get_min_payment_array, remaining_payments, remaining_payments_array, run_batch,
+                                schedule_arrays, simulate_payments, write_schedules)
+
+
+def random_loans(count, seed=0):
+    """Return (balance, annual rate, payment, payments per year) tuples whose payment covers the interest."""
+    rng = random.Random(seed)
+    loans = []
+    for _ in range(count):
+        balance = round(rng.uniform(1000, 500000), 2)
+        rate = rng.choice([0.0, round(rng.uniform(0.001, 0.12), 4)])
+        per_year = rng.choice([4, 12, 26])
+        payment = balance * rate / per_year + rng.uniform(1, balance / 12)
+        loans.append((balance, rate, payment, per_year))
+    return loans
+
+def test_remaining_payments_matches_simulation():
+    for loan in random_loans(500):
+        assert remaining_payments(*loan) == simulate_payments(*loan)
+
+def test_remaining_payments_exact_payoff():
+    # The last payment brings the balance to exactly zero
+    assert remaining_payments(1200, 0, 100, 12) == simulate_payments(1200, 0, 100, 12) == 12
+    assert remaining_payments(0, 0.05, 100, 12) == 0
+
+def test_remaining_payments_never_paid_off():
+    try:
+        remaining_payments(100000, 0.12, 1000, 12)
+    except ValueError:
+        pass
+    else:
+        assert False, "expected ValueError"
+
+def test_remaining_payments_array_matches_scalar():
+    loans = random_loans(500, seed=1)
+    balances, rates, payments, per_year = (np.array(column) for column in zip(*loans))
+    counts = remaining_payments_array(balances, rates, payments, per_year)
+    assert counts.tolist() == [simulate_payments(*loan) for loan in loans]
+
+    counts = remaining_payments_array([100000, 0], [0.12, 0.05], [1000, 100], 12)
+    assert counts.tolist() == [NEVER_PAID_OFF, 0]
+
+def test_get_min_payment_pays_off_in_term():
+    for balance, rate, _, per_year in random_loans(200, seed=2):
+        payment = get_min_payment(balance, rate, 30, per_year)
+        assert remaining_payments(balance, rate, payment, per_year) <= 30 * per_year
+
+def loan_file(loans):
+    """Write (principal, rate, years, per_year, target_payment) rows as a loan file."""
+    text = ",".join(LOAN_COLUMNS) + "\n"
+    for loan in loans:
+        text += ",".join("" if value is None else str(value) for value in loan) + "\n"
+    return io.StringIO(text)
+
+def batch_rows(loans, workers=1, chunk_size=3):
+    output = io.StringIO()
+    stats = run_batch(loan_file(loans), output, (-0.01, 0.0, 0.02), (0.0, 250.0), workers, chunk_size)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == ",".join(RESULT_COLUMNS)
+    return [line.split(",") for line in lines[1:]], stats
+
+def test_get_min_payment_array_matches_scalar():
+    loans = [(balance, rate, years, per_year)
+             for balance, rate, _, per_year in random_loans(200, seed=3) for years in (10, 30)]
+    balances, rates, years, per_year = (np.array(column) for column in zip(*loans))
+    assert get_min_payment_array(balances, rates, years, per_year).tolist() == \
+        [get_min_payment(*loan) for loan in loans]
+
+def test_run_batch_matches_scalar():
+    loans = [(200000, 0.05, 30, 12, None), (150000, 0.0, 15, 12, None), (100000, 0.04, 30, 26, 500),
+             (50000, 0.12, 10, 12, 400), (300000, 0.06, 30, 4, None)]
+    rows, stats = batch_rows(loans)
+    assert stats["loans"] == len(loans) and stats["results"] == len(loans) * 6
+    for loan, rate_shock, extra, rate, min_payment, payment, payments in rows:
+        principal, base_rate, years, per_year, target = loans[int(loan)]
+        rate = base_rate + float(rate_shock)
+        if target is None:
+            target = get_min_payment(principal, base_rate, years, per_year)
+        assert float(payment) == target + float(extra)
+        assert float(min_payment) == get_min_payment(principal, rate, years, per_year)
+        try:
+            expected = remaining_payments(principal, rate, float(payment), per_year)
+        except ValueError:
+            expected = NEVER_PAID_OFF
+        assert int(payments) == expected
+
+def test_run_batch_workers_match_serial():
+    loans = [(100000 + 1000 * i, 0.01 * (i % 8), 30, 12, None if i % 2 else 900) for i in range(40)]
+    serial, _ = batch_rows(loans)
+    parallel, stats = batch_rows(loans, workers=3, chunk_size=4)
+    assert parallel == serial
+    assert stats["loans"] == 40
+
+def test_invalid_loans_are_flagged():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        counts = remaining_payments_array([1000, np.nan, 1000], [0.05, 0.05, 0.05], [100, 100, 100], [12, 12, 0])
+        assert counts.tolist() == [11, INVALID_LOAN, INVALID_LOAN]
+        assert get_min_payment_array(1200, 0.0, 1, 12).tolist() == 100.0
+        get_min_payment_array(1200, 0.05, 1, 0)
+
+def schedule_loans(count, seed=3):
+    """Return loans as in random_loans() whose payments pay them off within 30 years."""
+    rng = random.Random(seed)
+    return [(balance, rate, get_min_payment(balance, rate, rng.randint(1, 30), per_year) * rng.uniform(1, 2), per_year)
+            for balance, rate, _, per_year in random_loans(count, seed)]
+
+def test_amortization_schedule_pays_off():
+    for loan in schedule_loans(100):
+        schedule = list(amortization_schedule(*loan))
+        assert len(schedule) == remaining_payments(*loan)
+        assert [row[0] for row in schedule] == list(range(1, len(schedule) + 1))
+        assert schedule[-1][4] == 0.0
+        assert abs(sum(row[3] for row in schedule) - loan[0]) < 1e-6 * loan[0]
+        for number, payment, interest, principal, balance in schedule:
+            assert abs(payment - interest - principal) < 1e-9 * payment
+    assert list(amortization_schedule(0, 0.05, 100, 12)) == []
+    try:
+        list(amortization_schedule(100000, 0.12, 1000, 12))
+    except ValueError:
+        pass
+    else:
+        assert False, "expected ValueError"
+
+def test_schedule_arrays_match_generator():
+    loans = schedule_loans(60, seed=4) + [(100000, 0.12, 1000, 12), (0, 0.05, 100, 12), (float("nan"), 0.05, 100, 12)]
+    columns = schedule_arrays(*(np.array(column) for column in zip(*loans)))
+    assert list(columns) == list(SCHEDULE_COLUMNS)
+    expected = [(loan,) + row for loan, args in enumerate(loans[:60]) for row in amortization_schedule(*args)]
+    assert len(columns["loan"]) == len(expected)
+    assert columns["loan"].tolist() == [row[0] for row in expected]
+    assert columns["number"].tolist() == [row[1] for row in expected]
+    for i, name in enumerate(SCHEDULE_COLUMNS[2:], 2):
+        assert np.allclose(columns[name], [row[i] for row in expected], rtol=1e-9, atol=1e-6)
+
+def test_write_schedules():
+    loans = schedule_loans(25, seed=5) + [(100000, 0.12, 1000, 12)]
+    arrays = [np.array(column) for column in zip(*loans)]
+    columns = schedule_arrays(*arrays)
+
+    text = io.StringIO()
+    count = write_schedules(text, *arrays, chunk_size=4)
+    lines = text.getvalue().splitlines()
+    assert count == len(columns["loan"]) == len(lines) - 1
+    assert lines[0] == ",".join(SCHEDULE_COLUMNS)
+    for line, loan, number, balance in zip(lines[1:], columns["loan"], columns["number"], columns["balance"]):
+        fields = line.split(",")
+        assert (int(fields[0]), int(fields[1])) == (loan, number)
+        assert fields[5] == f"{balance:.2f}"
+
+    binary = io.BytesIO()
+    assert write_schedules(binary, *arrays, binary=True, chunk_size=7) == count
+    records = np.frombuffer(binary.getvalue(), dtype=SCHEDULE_DTYPE)
+    for name in SCHEDULE_COLUMNS:
+        assert np.allclose(records[name], columns[name], rtol=1e-12)
+
+def test_batch_main_leaves_stdout_open():
+    loans = [(200000, 0.05, 30, 12, None), (100000, 0.04, 30, 26, 500)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "loans.csv")
+        with open(path, "w") as file:
+            file.write(loan_file(loans).getvalue())
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            batch_main(path, extra_payments=(0.0, 100.0))
+        assert not stdout.closed
+        assert len(stdout.getvalue().splitlines()) == 1 + len(loans) * 2
+        assert stderr.getvalue().startswith("2 loans, 4 results")
+
+
+if __name__ == "__main__":
+    test_remaining_payments_matches_simulation()
+    test_remaining_payments_exact_payoff()
+    test_remaining_payments_never_paid_off()
+    test_remaining_payments_array_matches_scalar()
+    test_get_min_payment_pays_off_in_term()
+    test_get_min_payment_array_matches_scalar()
+    test_run_batch_matches_scalar()
+    test_run_batch_workers_match_serial()
+    test_invalid_loans_are_flagged()
+    test_amortization_schedule_pays_off()
+    test_schedule_arrays_match_generator()
+    test_write_schedules()
+    test_batch_main_leaves_stdout_open()
+    print("All tests passed!")
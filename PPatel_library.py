@@ -5,15 +5,37 @@ import sys
 class Book:
     """Represents a book with call number, title, and author."""
 
+    __slots__ = ("_callnum", "title", "author", "_key")
+
     def __init__(self, callnum, title, author):
         """Initialize the Book object with call number, title, and author."""
         self.callnum = callnum
         self.title = title
         self.author = author
 
+    @property
+    def callnum(self):
+        """The call number; setting it discards the cached sort key."""
+        return self._callnum
+
+    @callnum.setter
+    def callnum(self, callnum):
+        self._callnum = callnum
+        self._key = None
+
     def __lt__(self, other):
         """Compare two Book objects based on their call numbers."""
-        return self.compare_callnum(self.callnum, other.callnum)
+        return self.sort_key() < other.sort_key()
+
+    def sort_key(self):
+        """Return the parts of the call number followed by the whole call number, parsing it on first use only.
+
+        parse_callnum() always returns the same number of parts, so
+        comparing these keys orders call numbers as compare_callnum() does.
+        """
+        if self._key is None:
+            self._key = (tuple(self.parse_callnum(self.callnum)), self.callnum)
+        return self._key
 
     def __repr__(self):
         """Return a string representation of the Book object."""
@@ -36,15 +58,24 @@ class Book:
         return callnum1 < callnum2
 
     def parse_callnum(self, callnum):
-        """Parse the call number into its various parts."""
-        # Split the call number into the class, number, cutter, and year components
-        class_num, cutter, year = re.findall(r"([A-Z]+|\d+\.?\d*|[A-Z]\d+|\d+)$", callnum)
+        """Parse the call number into its various parts.
 
-        # Split the class into separate letters (if present)
-        class_letters = re.findall(r"[A-Z]", class_num)
-        class_number = re.findall(r"\d+", class_num)
+        Every call number gives a list of the same length: class letters,
+        class number, then the letter and number of up to two cutters, then
+        the year, e.g. "QA76.73.P98 L88 2013". Parts that are missing, or
+        a call number that does not have this form, give '' or 0.
+        """
+        # Split the call number into the class, number, cutter, and year components
+        match = re.match(r"([A-Z]+)(\d+(?:\.\d+)?)(?:\s*\.?([A-Z])(\d+))?(?:\s*\.?([A-Z])(\d+))?(?:\s+(\d{4}))?$", callnum)
+        if not match:
+            return ['', 0, '', 0, '', 0, '']
+        class_letters, class_number, letter1, number1, letter2, number2, year = match.groups()
 
-        return class_letters + class_number + [cutter, year]
+        # Class numbers are numbers; cutter numbers are decimal fractions
+        return [class_letters, float(class_number),
+                letter1 or '', float('0.' + number1) if number1 else 0,
+                letter2 or '', float('0.' + number2) if number2 else 0,
+                year or '']
 
 def read_books(filename):
     """Read book information from a file and return a list of Book objects."""
@@ -58,7 +89,7 @@ def read_books(filename):
 
 def print_books(books):
     """Print information about each book, in order."""
-    for book in sorted(books):
+    for book in sorted(books, key=Book.sort_key):
         print(book)
 
 def parse_args(arglist):
@@ -2,17 +2,77 @@
 relative to other documents in a corpus. """
 
 from argparse import ArgumentParser
-from collections import Counter
-from math import log
+from collections import Counter, OrderedDict, namedtuple
+from collections.abc import Mapping
+from multiprocessing import Pool
+import os
 from pathlib import Path
 import re
 import sys
 
+import numpy as np
+
+from ArrayFile import has_magic, read_arrays, write_arrays
+from Vocabulary import Vocabulary, iter_words
+
+INDEX_MAGIC = b"TFIDFIX1"
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
 
 class TfidfCalculator:
-    def __init__(self):
-        self.tf = {}
-        self.df = Counter()
+    """ Compute tf-idf scores over a corpus of documents.
+
+    Words are interned into integer term IDs (in a Vocabulary that may be
+    shared with other indexes) as files are read, and each
+    document is stored as a row of (term ID, count) arrays. Before scoring,
+    the rows are compiled into a CSR term-document matrix so tf-idf can be
+    computed for every document in one vectorized pass.
+
+    Attributes:
+        vocabulary (Vocabulary): The word <-> term ID mapping.
+        vocab (dict of str: int): Term ID for each word seen so far.
+        terms (list of str): Word for each term ID.
+        tf (Mapping): Read-only mapping of filename to a Counter of words.
+        df (Mapping): Read-only mapping of word to number of documents
+            containing it.
+
+    Args:
+        vocabulary (Vocabulary, optional): Vocabulary to intern words in;
+            by default the calculator creates its own.
+        cache_size (int): Maximum number of documents whose sorted scores
+            are kept for important_words(); 0 disables the cache.
+            (Default: 1024)
+    """
+
+    def __init__(self, vocabulary=None, cache_size=1024):
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        self._doc_ids = {}
+        self._rows = []
+        self._df = np.zeros(0, dtype=np.int64)
+        self._stats = {}
+        self._matrix = None
+        self._postings = None
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    @property
+    def vocab(self):
+        return self.vocabulary.ids
+
+    @property
+    def terms(self):
+        return self.vocabulary.words
+
+    @property
+    def tf(self):
+        return _TermFrequencies(self)
+
+    @property
+    def df(self):
+        return _DocumentFrequencies(self)
 
     def read_file(self, filename):
         """ Read a file and update the tf and df attributes.
@@ -23,16 +83,308 @@ class TfidfCalculator:
         Returns:
             None
         """
+        stat = _file_stat(filename)
         with open(filename, 'r') as file:
-            content = file.read()
-            words = get_words(content)
+            self.add_document(filename, Counter(iter_words(file)))
+        self._stats[filename] = stat
+
+    def add_document(self, filename, counts):
+        """ Add (or replace) a document's word counts in the corpus.
+
+        Args:
+            filename (str): Name under which to store the document.
+            counts (Counter): Number of occurrences of each word in the document.
+
+        Returns:
+            None
+        """
+        ids = np.fromiter((self.vocabulary.id(word) for word in counts),
+                          dtype=np.int64, count=len(counts))
+        self._add_row(filename, ids, np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+        self._stats.pop(filename, None)
 
-            # Update tf dictionary
-            self.tf[filename] = Counter(words)
+    def remove_documents(self, filenames):
+        """ Remove documents from the corpus, subtracting them from df.
 
-            # Update df Counter
-            unique_words = set(words)
-            self.df.update(unique_words)
+        Args:
+            filenames (iterable of str): Names of documents previously added.
+
+        Returns:
+            None
+        """
+        removed = {self._doc_ids[filename] for filename in filenames}
+        if not removed:
+            return
+        for doc in removed:
+            self._df[self._rows[doc][0]] -= 1
+
+        names = sorted(self._doc_ids, key=self._doc_ids.get)
+        self._rows = [row for doc, row in enumerate(self._rows) if doc not in removed]
+        self._doc_ids = {}
+        for doc, filename in enumerate(names):
+            if doc not in removed:
+                self._doc_ids[filename] = len(self._doc_ids)
+            else:
+                self._stats.pop(filename, None)
+        self._invalidate()
+
+    def refresh(self, filenames, workers=1):
+        """ Bring the corpus up to date with a list of files.
+
+        Files whose modification time or size differ from when they were
+        last read (or that have not been read yet) are re-tokenized, and
+        their old contributions to df are replaced. Documents that are not
+        in filenames are removed.
+
+        Args:
+            filenames (iterable of str or Path): Paths of every file in the corpus.
+            workers (int): Number of processes to read changed files with. (Default: 1)
+
+        Returns:
+            tuple: (changed, removed), the lists of files that were
+            (re-)read and removed.
+        """
+        filenames = [str(filename) for filename in filenames]
+        current = set(filenames)
+        removed = [name for name in self._doc_ids if name not in current]
+        self.remove_documents(removed)
+
+        changed = [name for name in filenames if self._stats.get(name) != _file_stat(name)]
+        if changed:
+            self.merge(read_corpus(changed, workers=workers))
+        return changed, removed
+
+    def save(self, path):
+        """ Write the corpus to a binary index file.
+
+        The file holds a JSON header (documents, file stats and array
+        layout), followed by the vocabulary and the CSR arrays, each aligned
+        so that load() can memory-map them. The file is written under a
+        temporary name and moved into place, so it is safe to save over an
+        index this calculator was loaded from.
+
+        Args:
+            path (str or Path): Where to write the index.
+
+        Returns:
+            None
+        """
+        indptr, indices, counts, _ = self._compile()
+        names = sorted(self._doc_ids, key=self._doc_ids.get)
+        arrays = {
+            "indptr": indptr.astype(np.int64),
+            "indices": indices.astype(np.int32),
+            "counts": counts.astype(np.int64),
+            "df": self._grow_df()[:len(self.terms)].astype(np.int64),
+            "terms": np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+        }
+
+        write_arrays(path, INDEX_MAGIC, {
+            "num_terms": len(self.terms),
+            "documents": [[name] + list(self._stats.get(name, (None, None))) for name in names],
+        }, arrays)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a corpus previously written with save().
+
+        The term and count arrays are memory-mapped rather than read, so
+        loading cost depends on the number of documents and terms, not on
+        the size of the corpus.
+
+        Args:
+            path (str or Path): Path to an index file.
+
+        Returns:
+            TfidfCalculator: The loaded calculator.
+
+        Raises:
+            ValueError: path is not a TF-IDF index file.
+        """
+        if not has_magic(path, INDEX_MAGIC):
+            raise ValueError(f"{path} is not a TF-IDF index file")
+        header, arrays = read_arrays(path, INDEX_MAGIC)
+
+        calc = cls()
+        if header["num_terms"]:
+            calc.vocabulary = Vocabulary(bytes(arrays["terms"]).decode("utf-8").split("\n"))
+        calc._df = np.array(arrays["df"], dtype=np.int64)
+
+        indptr, indices, counts = arrays["indptr"], arrays["indices"], arrays["counts"]
+        for doc, (name, mtime, size) in enumerate(header["documents"]):
+            calc._doc_ids[name] = doc
+            calc._rows.append((indices[indptr[doc]:indptr[doc + 1]],
+                               counts[indptr[doc]:indptr[doc + 1]]))
+            if mtime is not None:
+                calc._stats[name] = (mtime, size)
+        return calc
+
+    def merge(self, other):
+        """ Add every document from another calculator to this one.
+
+        Documents are appended in the order other read them, so merging
+        calculators built from consecutive shards of a file list gives the
+        same result as reading the whole list into one calculator.
+
+        Args:
+            other (TfidfCalculator): Calculator whose documents are added.
+
+        Returns:
+            TfidfCalculator: self, so merges can be chained.
+        """
+        remap = np.fromiter((self.vocabulary.id(word) for word in other.terms),
+                            dtype=np.int64, count=len(other.terms))
+        for filename, doc in other._doc_ids.items():
+            ids, counts = other._rows[doc]
+            self._add_row(filename, remap[ids], counts)
+            if filename in other._stats:
+                self._stats[filename] = other._stats[filename]
+        return self
+
+    def _grow_df(self):
+        """ Make room in the document frequencies for every term in the vocabulary.
+
+        A shared vocabulary may gain words from other indexes at any time,
+        so this is done before the frequencies are read as well as before
+        they are updated; new terms have a frequency of 0.
+
+        Returns:
+            numpy.ndarray: The document frequencies, at least len(self.terms) long.
+        """
+        if len(self._df) < len(self.terms):
+            grown = np.zeros(max(len(self.terms), 2 * len(self._df)), dtype=np.int64)
+            grown[:len(self._df)] = self._df
+            self._df = grown
+        return self._df
+
+    def _add_row(self, filename, ids, counts):
+        """ Store a document row and update the document frequencies. """
+        self._grow_df()
+
+        doc = self._doc_ids.get(filename)
+        if doc is None:
+            self._doc_ids[filename] = len(self._rows)
+            self._rows.append((ids, counts))
+        else:
+            self._df[self._rows[doc][0]] -= 1
+            self._rows[doc] = (ids, counts)
+        self._df[ids] += 1
+        self._invalidate()
+
+    def _invalidate(self):
+        """ Discard compiled scores after the corpus has changed. """
+        self._matrix = None
+        self._postings = None
+        self._cache.clear()
+
+    def cache_info(self):
+        """ Report statistics for the important_words() score cache.
+
+        Returns:
+            CacheInfo: Named tuple of hits, misses, maxsize and currsize.
+        """
+        return CacheInfo(self._cache_hits, self._cache_misses, self._cache_size, len(self._cache))
+
+    def _compile(self):
+        """ Build the CSR matrix and tf-idf scores for every document.
+
+        Returns:
+            tuple: (indptr, indices, counts, scores) arrays, where the terms
+            of document i are indices[indptr[i]:indptr[i+1]].
+        """
+        if self._matrix is None:
+            lengths = np.fromiter((len(ids) for ids, _ in self._rows),
+                                  dtype=np.int64, count=len(self._rows))
+            indptr = np.zeros(len(self._rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            if self._rows:
+                indices = np.concatenate([ids for ids, _ in self._rows])
+                counts = np.concatenate([c for _, c in self._rows])
+            else:
+                indices = counts = np.zeros(0, dtype=np.int64)
+
+            # Per-document word totals; bincount (unlike reduceat) copes with
+            # empty documents anywhere, including at the end
+            totals = np.bincount(np.repeat(np.arange(len(lengths)), lengths), weights=counts,
+                                 minlength=len(lengths))
+            totals = np.where(lengths > 0, totals, 1)
+            with np.errstate(divide='ignore'):
+                idf = np.log(len(self._rows) / self._grow_df()[:len(self.terms)])
+            scores = (counts / np.repeat(totals, lengths)) * idf[indices]
+            self._matrix = (indptr, indices, counts, scores)
+        return self._matrix
+
+    def _compile_postings(self):
+        """ Build the inverted index from the compiled CSR matrix.
+
+        Returns:
+            tuple: (termptr, positions, names), where positions[termptr[t]:termptr[t+1]]
+            are the positions in the CSR arrays of every posting for term t, in
+            document order, and names[d] is the filename of document d.
+        """
+        if self._postings is None:
+            indptr, indices, _, _ = self._compile()
+            positions = np.argsort(indices, kind='stable')
+            termptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(indices, minlength=len(self.terms)), out=termptr[1:])
+            names = sorted(self._doc_ids, key=self._doc_ids.get)
+            self._postings = (termptr, positions, names)
+        return self._postings
+
+    def important_documents(self, word, num_docs=10):
+        """ Find the documents in which a word has the highest tf-idf score.
+
+        Only the postings for word are examined, so the cost depends on how
+        many documents contain it rather than on the size of the corpus.
+
+        Args:
+            word (str): The word to look up.
+            num_docs (int, optional): Number of documents to return. Defaults to 10.
+
+        Returns:
+            dict: Dictionary containing the top num_docs filenames as keys and the word's tf-idf score in each as values.
+        """
+        term = self.vocab.get(word)
+        if term is None:
+            return {}
+        indptr, _, _, scores = self._compile()
+        termptr, positions, names = self._compile_postings()
+        postings = positions[termptr[term]:termptr[term + 1]]
+
+        docs = np.searchsorted(indptr, postings, side='right') - 1
+        order = _top_k(scores[postings], num_docs)
+        return {
+            names[doc]: score
+            for doc, score in zip(docs[order].tolist(), scores[postings[order]].tolist())
+        }
+
+    def important_words_across(self, filenames, num_words=10):
+        """ Find the words with the highest total tf-idf score across several files.
+
+        Only the terms of the given files are examined, so the cost depends
+        on their size rather than on the size of the corpus.
+
+        Args:
+            filenames (iterable of str): Paths to files previously read.
+            num_words (int, optional): Number of important words to return. Defaults to 10.
+
+        Returns:
+            dict: Dictionary containing the top num_words words as keys and the sum of their tf-idf scores in the files as values.
+        """
+        indptr, indices, _, scores = self._compile()
+        docs = [self._doc_ids[filename] for filename in filenames]
+        if not docs:
+            return {}
+        row_terms = np.concatenate([indices[indptr[doc]:indptr[doc + 1]] for doc in docs])
+        row_scores = np.concatenate([scores[indptr[doc]:indptr[doc + 1]] for doc in docs])
+
+        terms, inverse = np.unique(row_terms, return_inverse=True)
+        totals = np.bincount(inverse, weights=row_scores, minlength=len(terms))
+        order = _top_k(totals, num_words)
+        return {
+            self.terms[term]: score
+            for term, score in zip(terms[order].tolist(), totals[order].tolist())
+        }
 
     def important_words(self, filename, num_words=10):
         """ Calculate the important words in a file based on tf-idf metric.
@@ -44,25 +396,108 @@ class TfidfCalculator:
         Returns:
             dict: Dictionary containing the top num_words words as keys and their corresponding tf-idf scores as values.
         """
-        total_words = sum(self.tf[filename].values())
-        total_documents = len(self.tf)
+        doc = self._doc_ids[filename]
+        if doc in self._cache:
+            self._cache_hits += 1
+            self._cache.move_to_end(doc)
+            words, scores = self._cache[doc]
+            return dict(zip(words[:num_words], scores[:num_words]))
 
-        tfidf_scores = {
-            word: (self.tf[filename][word] / total_words) * log(total_documents / self.df[word])
-            for word in self.tf[filename]
-        }
+        self._cache_misses += 1
+        indptr, indices, _, scores = self._compile()
+        row_terms = indices[indptr[doc]:indptr[doc + 1]]
+        row_scores = scores[indptr[doc]:indptr[doc + 1]]
 
-        sorted_words = sorted(tfidf_scores, key=tfidf_scores.get, reverse=True)
+        if self._cache_size <= 0:
+            order = _top_k(row_scores, num_words)
+            return {
+                self.terms[term]: score
+                for term, score in zip(row_terms[order].tolist(), row_scores[order].tolist())
+            }
 
-        if num_words is None:
-            num_words = len(sorted_words)
+        # Sort the whole row once so later calls with any num_words are hits
+        order = _top_k(row_scores, None)
+        words = [self.terms[term] for term in row_terms[order].tolist()]
+        scores = row_scores[order].tolist()
+        self._cache[doc] = (words, scores)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return dict(zip(words[:num_words], scores[:num_words]))
+
+
+class _TermFrequencies(Mapping):
+    """ Read-only view of a TfidfCalculator's documents as word Counters. """
+
+    def __init__(self, calc):
+        self._calc = calc
+
+    def __getitem__(self, filename):
+        ids, counts = self._calc._rows[self._calc._doc_ids[filename]]
+        terms = self._calc.terms
+        return Counter({terms[i]: c for i, c in zip(ids.tolist(), counts.tolist())})
+
+    def __iter__(self):
+        return iter(self._calc._doc_ids)
+
+    def __len__(self):
+        return len(self._calc._doc_ids)
+
+    def __contains__(self, filename):
+        return filename in self._calc._doc_ids
 
-        important = {
-            word: tfidf_scores[word]
-            for word in sorted_words[:num_words]
-        }
 
-        return important
+class _DocumentFrequencies(Mapping):
+    """ Read-only view of a TfidfCalculator's document frequencies.
+
+    Like a Counter, words that do not occur in the corpus have a count of 0.
+    """
+
+    def __init__(self, calc):
+        self._calc = calc
+
+    def __getitem__(self, word):
+        term = self._calc.vocab.get(word)
+        return 0 if term is None else int(self._calc._grow_df()[term])
+
+    def __iter__(self):
+        df = self._calc._grow_df()
+        return (word for term, word in enumerate(self._calc.terms) if df[term] > 0)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._calc._df))
+
+    def __contains__(self, word):
+        return self[word] > 0
+
+
+def _file_stat(filename):
+    """ Return the (modification time, size) of a file, or None if it is missing. """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _top_k(scores, k):
+    """ Return the positions of the k highest scores, best first.
+
+    Ties are broken by position, matching a stable descending sort, but only
+    the candidates selected by argpartition are actually sorted.
+
+    Args:
+        scores (numpy.ndarray): Scores to rank.
+        k (int or None): Number of positions to return; None returns all.
+
+    Returns:
+        numpy.ndarray: Positions into scores.
+    """
+    if k is None or k <= 0 or k >= len(scores):
+        candidates = np.arange(len(scores))
+    else:
+        threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
 
 
 def get_words(s):
@@ -83,7 +518,53 @@ def get_words(s):
     return words
 
 
-def main(directory, files, pattern="*", num_words=10):
+def read_corpus(filenames, workers=1):
+    """ Read files into a TfidfCalculator, optionally using several processes.
+
+    With more than one worker, the file list is split into consecutive
+    shards that are tokenized in a process pool. The per-shard calculators
+    are then merged pairwise in a tree reduction that keeps the shards in
+    order, so the result is identical to reading the files serially.
+
+    Args:
+        filenames (list of str): Paths of the files to read, in order.
+        workers (int): Number of worker processes to use. (Default: 1)
+
+    Returns:
+        TfidfCalculator: A calculator containing every file.
+    """
+    filenames = [str(filename) for filename in filenames]
+    if workers <= 1 or len(filenames) < 2:
+        return _read_shard(filenames)
+
+    num_shards = min(len(filenames), workers * 4)
+    bounds = [len(filenames) * i // num_shards for i in range(num_shards + 1)]
+    shards = [filenames[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    with Pool(workers) as pool:
+        calcs = pool.map(_read_shard, shards)
+        while len(calcs) > 1:
+            merged = pool.starmap(_merge_pair, zip(calcs[0::2], calcs[1::2]))
+            if len(calcs) % 2:
+                merged.append(calcs[-1])
+            calcs = merged
+    return calcs[0]
+
+
+def _read_shard(filenames):
+    """ Read a list of files into a new TfidfCalculator. """
+    calc = TfidfCalculator()
+    for filename in filenames:
+        calc.read_file(filename)
+    return calc
+
+
+def _merge_pair(left, right):
+    """ Merge right into left, for use in a process pool. """
+    return left.merge(right)
+
+
+def main(directory, files, pattern="*", num_words=10, workers=1, index=None):
     """ Read files from a directory, and identify the most important words in one or more specified files.
 
     Args:
@@ -91,13 +572,22 @@ def main(directory, files, pattern="*", num_words=10):
         files (list of (str or Path)): Paths to files for which the user wants to identify the most important words.
         pattern (str): Glob pattern for files to include from directory. (Default: "*")
         num_words (int): The number of important words to report for each specified file. (Default: 10)
+        workers (int): The number of processes to read the corpus with. (Default: 1)
+        index (str or Path or None): Index file to load the corpus from and
+            save it to. Only files that changed since the index was saved are
+            read. (Default: None)
 
     Returns:
         None
     """
-    calc = TfidfCalculator()
-    for document in Path(directory).glob(pattern):
-        calc.read_file(str(document))
+    documents = Path(directory).glob(pattern)
+    if index is None:
+        calc = read_corpus(documents, workers=workers)
+    else:
+        calc = TfidfCalculator.load(index) if Path(index).exists() else TfidfCalculator()
+        changed, removed = calc.refresh(documents, workers=workers)
+        if changed or removed or not Path(index).exists():
+            calc.save(index)
 
     if not files:
         files = sorted(calc.tf)
@@ -123,12 +613,16 @@ def parse_args(arglist):
             files (list of pathlib.Path)
             pattern (str)
             num_words (int)
+            workers (int)
+            index (pathlib.Path or None)
     """
     parser = ArgumentParser()
     parser.add_argument("directory", type=Path, help="Directory containing documents to read in")
     parser.add_argument("files", type=Path, nargs="*", help="File(s) to identify important words in")
     parser.add_argument("-p", "--pattern", default="*", help="Glob pattern specifying which files to read in")
     parser.add_argument("-n", "--num_words", type=int, default=10, help="Number of words to display (default is 10)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of processes used to read the corpus (default is 1)")
+    parser.add_argument("-i", "--index", type=Path, help="Index file used to cache the corpus between runs")
     args = parser.parse_args(arglist)
 
     for path in args.files:
@@ -143,4 +637,5 @@ def parse_args(arglist):
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.directory, args.files, pattern=args.pattern, num_words=args.num_words)
+    main(args.directory, args.files, pattern=args.pattern, num_words=args.num_words,
+         workers=args.workers, index=args.index)
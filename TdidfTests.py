@@ -0,0 +1,230 @@
+from collections import Counter
+import io
+from math import log
+import os
+import random
+import tempfile
+
+from Tdidf import TfidfCalculator, get_words, read_corpus
+from UniqueWords import UniqueWords
+from Vocabulary import Vocabulary, iter_words
+
+TEXTS = {
+    "a.txt": "The cat sat on the mat. The cat purred.",
+    "b.txt": "A dog sat on a log -- the dog barked at the cat.",
+    "c.txt": "Birds sing; the birds fly over the log and the mat.",
+    "d.txt": "Don't panic: it's only a well-known test, isn't it?",
+}
+
+
+def write_corpus(directory, texts=TEXTS):
+    """Write each text to a file in directory and return the paths, in order."""
+    paths = []
+    for name, text in texts.items():
+        path = os.path.join(directory, name)
+        with open(path, "w") as file:
+            file.write(text)
+        paths.append(path)
+    return paths
+
+def reference_scores(texts, name):
+    """tf-idf scores of every word in one text, computed directly from the definition."""
+    tf = {other: Counter(get_words(text)) for other, text in texts.items()}
+    df = Counter(word for counts in tf.values() for word in counts)
+    total = sum(tf[name].values())
+    return {word: (count / total) * log(len(tf) / df[word]) for word, count in tf[name].items()}
+
+def reference_important_words(texts, name, num_words=10):
+    scores = reference_scores(texts, name)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return {word: scores[word] for word in ranked[:num_words]}
+
+def test_important_words_matches_reference():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory)
+        calc = TfidfCalculator()
+        for path in paths:
+            calc.read_file(path)
+        texts = dict(zip(paths, TEXTS.values()))
+        for path in paths:
+            for num_words in (1, 3, None):
+                expected = reference_important_words(texts, path, num_words)
+                result = calc.important_words(path, num_words)
+                assert list(result) == list(expected)
+                for word in expected:
+                    assert abs(result[word] - expected[word]) < 1e-12
+
+def test_empty_document_last():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, {"a.txt": "apple banana apple", "b.txt": "banana cherry", "z.txt": ""})
+        calc = TfidfCalculator()
+        for path in paths:
+            calc.read_file(path)
+        assert calc.important_words(paths[2]) == {}
+        assert list(calc.important_words(paths[0])) == ["apple", "banana"]
+        assert list(calc.important_documents("banana")) == [paths[1], paths[0]]
+
+def test_shared_vocabulary_grows_after_reading():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, {"a.txt": "one two", "b.txt": "two three", "c.txt": "four five six"})
+        vocabulary = Vocabulary()
+        calc = TfidfCalculator(vocabulary)
+        calc.read_file(paths[0])
+        calc.read_file(paths[1])
+        unique = UniqueWords(vocabulary)
+        unique.add_file(paths[2], "c")
+        vocabulary.id("seven")
+
+        assert calc.df["two"] == 2
+        assert calc.df["four"] == 0 and calc.df["seven"] == 0
+        assert "four" not in calc.df
+        assert dict(calc.df) == {"one": 1, "two": 2, "three": 1}
+        assert len(calc.df) == 3
+
+        index = os.path.join(directory, "index.bin")
+        calc.save(index)
+        loaded = TfidfCalculator.load(index)
+        assert dict(loaded.df) == dict(calc.df)
+        assert loaded.important_words(paths[0]) == calc.important_words(paths[0])
+
+def random_texts(count, seed=0):
+    """Texts made of words drawn from a small vocabulary, so documents share words."""
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "don't", "well-known", "x_y", "zeta", "eta", "theta"]
+    return {f"doc{i:03d}.txt": " ".join(rng.choice(words) for _ in range(rng.randrange(0, 40)))
+            for i in range(count)}
+
+def test_read_corpus_workers_matches_serial():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, random_texts(37))
+        serial = read_corpus(paths)
+        parallel = read_corpus(paths, workers=3)
+        assert list(parallel.tf) == list(serial.tf) == paths
+        assert dict(parallel.df) == dict(serial.df)
+        for path in paths:
+            assert parallel.tf[path] == serial.tf[path]
+            assert parallel.important_words(path) == serial.important_words(path)
+
+def test_iter_words_matches_get_words():
+    rng = random.Random(1)
+    alphabet = "ab'-_ \n.,--é9"
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 60)))
+        expected = get_words(text)
+        for chunk_size in (1, 2, 3, 7, 64):
+            assert list(iter_words(io.StringIO(text), chunk_size)) == expected, (text, chunk_size)
+
+def test_save_load_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, random_texts(12, seed=2))
+        calc = read_corpus(paths)
+        index = os.path.join(directory, "index.bin")
+        calc.save(index)
+        loaded = TfidfCalculator.load(index)
+        assert list(loaded.tf) == paths
+        assert dict(loaded.df) == dict(calc.df)
+        for path in paths:
+            assert loaded.tf[path] == calc.tf[path]
+            assert loaded.important_words(path) == calc.important_words(path)
+        assert loaded.refresh(paths) == ([], [])
+
+def test_refresh_rereads_changed_files():
+    with tempfile.TemporaryDirectory() as directory:
+        texts = random_texts(6, seed=3)
+        paths = write_corpus(directory, texts)
+        calc = read_corpus(paths)
+        assert calc.refresh(paths) == ([], [])
+
+        with open(paths[1], "w") as file:
+            file.write("entirely new words here")
+        os.remove(paths[4])
+        added = os.path.join(directory, "new.txt")
+        with open(added, "w") as file:
+            file.write("alpha omega")
+        current = [path for path in paths if path != paths[4]] + [added]
+
+        changed, removed = calc.refresh(current)
+        assert changed == [paths[1], added]
+        assert removed == [paths[4]]
+
+        fresh = read_corpus(current)
+        assert set(calc.tf) == set(current)
+        assert dict(calc.df) == dict(fresh.df)
+        for path in current:
+            assert calc.tf[path] == fresh.tf[path]
+            assert calc.important_words(path) == fresh.important_words(path)
+        assert calc.refresh(current) == ([], [])
+
+def test_important_words_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, random_texts(5, seed=4))
+        calc = TfidfCalculator(cache_size=2)
+        for path in paths:
+            calc.read_file(path)
+        assert calc.cache_info() == (0, 0, 2, 0)
+
+        first = calc.important_words(paths[0], 3)
+        assert calc.important_words(paths[0], None) == calc.important_words(paths[0], None)
+        assert list(calc.important_words(paths[0], None))[:3] == list(first)
+        assert calc.cache_info() == (3, 1, 2, 1)
+
+        calc.important_words(paths[1])
+        calc.important_words(paths[2])
+        assert calc.cache_info().currsize == 2
+        calc.important_words(paths[0])
+        assert calc.cache_info().misses == 4
+
+        # Adding a document changes idf, so cached scores must be dropped
+        calc.add_document("extra", Counter(calc.tf[paths[0]]))
+        assert calc.cache_info().currsize == 0
+        uncached = TfidfCalculator(cache_size=0)
+        for path in paths:
+            uncached.read_file(path)
+        uncached.add_document("extra", Counter(calc.tf[paths[0]]))
+        for path in paths:
+            assert calc.important_words(path) == uncached.important_words(path)
+        assert uncached.cache_info().currsize == 0
+
+def test_important_documents_and_words_across_match_reference():
+    texts = random_texts(20, seed=5)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, texts)
+        calc = read_corpus(paths)
+        texts = dict(zip(paths, texts.values()))
+        scores = {path: reference_scores(texts, path) for path in paths}
+
+        for word in ("alpha", "don't", "well-known", "x_y", "theta"):
+            result = calc.important_documents(word, 5)
+            expected = sorted((path for path in paths if word in scores[path]),
+                              key=lambda path: -scores[path][word])[:5]
+            assert sorted(result.values(), reverse=True) == list(result.values())
+            assert [round(scores[path][word], 12) for path in expected] == \
+                [round(score, 12) for score in result.values()]
+            for path, score in result.items():
+                assert abs(score - scores[path][word]) < 1e-12
+        assert calc.important_documents("missing") == {}
+
+        chosen = paths[3:9]
+        totals = Counter()
+        for path in chosen:
+            totals.update(scores[path])
+        result = calc.important_words_across(chosen, 4)
+        expected = sorted(totals.values(), reverse=True)[:4]
+        assert len(result) == 4
+        for (word, score), total in zip(result.items(), expected):
+            assert abs(score - totals[word]) < 1e-12
+            assert abs(score - total) < 1e-12
+        assert calc.important_words_across([]) == {}
+
+
+if __name__ == "__main__":
+    test_important_words_matches_reference()
+    test_empty_document_last()
+    test_shared_vocabulary_grows_after_reading()
+    test_read_corpus_workers_matches_serial()
+    test_iter_words_matches_get_words()
+    test_save_load_round_trip()
+    test_refresh_rereads_changed_files()
+    test_important_words_cache()
+    test_important_documents_and_words_across_match_reference()
+    print("All tests passed!")
@@ -1,5 +1,59 @@
 import argparse
+from contextlib import nullcontext
+import csv
+from itertools import islice
 import sys
+import time
+
+import numpy as np
+
+FULL_TIME_CREDITS = 12
+ROSTER_COLUMNS = ("student", "credits", "resident", "dt")
+ROSTER_CHUNK = 10000  # students calculated at a time in roster mode
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+
+# Rates per (resident, dt): (per credit, full time) tuition, and the
+# (per credit, full time) differential tuition added on top, if any.
+TUITION_RATES = {
+    (True, False): ((367.00, 4412.00), None),
+    (True, True): ((367.00, 4412.00), (118.00, 1428.00)),
+    (False, False): ((1456.00, 17468.00), None),
+    (False, True): ((1456.00, 17468.00), None),
+}
+
+
+def _rate_tuition(credits, resident, dt):
+    """Apply the rates in TUITION_RATES to a non-negative number of credits."""
+    tuition = 0.0
+
+    if credits == 0:
+        return tuition
+
+    rates, differential = TUITION_RATES[bool(resident), bool(dt)]
+    tuition = rates[1] if credits >= FULL_TIME_CREDITS else credits * rates[0]
+    if differential:
+        tuition += differential[1] if credits >= FULL_TIME_CREDITS else credits * differential[0]
+
+    return tuition
+
+
+def _tuition_table():
+    """Tabulate tuition by residency, differential tuition and credits.
+
+    Returns:
+        numpy.ndarray: table[resident, dt, credits] for 0 to
+        FULL_TIME_CREDITS credits, where the last entry also holds for
+        every larger number of credits.
+    """
+    table = np.zeros((2, 2, FULL_TIME_CREDITS + 1))
+    for (resident, dt) in TUITION_RATES:
+        for credits in range(FULL_TIME_CREDITS + 1):
+            table[int(resident), int(dt), credits] = _rate_tuition(credits, resident, dt)
+    return table
+
+
+TUITION_TABLE = _tuition_table()
 
 
 def calculate_tuition(credits=12, resident=True, dt=False):
@@ -25,29 +79,163 @@ def calculate_tuition(credits=12, resident=True, dt=False):
     """
     if credits < 0:
         raise ValueError("credits must be non-negative.")
-    
-    tuition = 0.0
-    
-    if credits == 0:
-        return tuition
 
-    if resident:
-        if credits >= 12:
-            tuition = 4412.00
-        else:
-            tuition = credits * 367.00
-    else:
-        if credits >= 12:
-            tuition = 17468.00
-        else:
-            tuition = credits * 1456.00
-    
-    if resident and dt and credits >= 12:
-        tuition += 1428.00
-    elif resident and dt and credits < 12:
-        tuition += credits * 118.00
-    
-    return tuition
+    return _rate_tuition(credits, resident, dt)
+
+
+def calculate_tuition_batch(credits, resident, dt):
+    """Calculates tuition and mandatory fees for many students at once.
+
+    Looks each student up in TUITION_TABLE, so the results are exactly
+    those of calculate_tuition(). Students with a fractional number of
+    credits are calculated with calculate_tuition() instead.
+
+    Args:
+        credits (array-like of int): the number of credits each student
+            is taking.
+        resident (array-like of bool): whether each student is a
+            Maryland state resident for tuition purposes.
+        dt (array-like of bool): whether each student pays differential
+            tuition.
+
+    Returns:
+        tuple: a numpy.ndarray of each student's combined tuition and
+        mandatory fees, NaN for students whose credits are invalid, and a
+        dict mapping the index of each such student to the ValueError
+        calculate_tuition() raises for them.
+    """
+    credits, resident, dt = np.broadcast_arrays(np.asarray(credits), np.asarray(resident, dtype=bool),
+                                                np.asarray(dt, dtype=bool))
+    credits = credits.ravel()
+    resident = resident.ravel()
+    dt = dt.ravel()
+    tuition = np.full(credits.shape, np.nan)
+
+    valid = credits >= 0
+    whole = valid & (credits == np.floor(credits))
+    capped = np.minimum(credits[whole], FULL_TIME_CREDITS).astype(np.intp)
+    tuition[whole] = TUITION_TABLE[resident[whole].astype(np.intp), dt[whole].astype(np.intp), capped]
+    for i in np.flatnonzero(valid & ~whole):
+        tuition[i] = calculate_tuition(credits[i].item(), resident[i], dt[i])
+
+    errors = {i: ValueError("credits must be non-negative.") for i in np.flatnonzero(~valid).tolist()}
+    return tuition, errors
+
+
+def bill_roster(roster, output, chunk_size=ROSTER_CHUNK):
+    """Calculates tuition for every student in a roster.
+
+    The roster is CSV with a header line and the columns in
+    ROSTER_COLUMNS; resident and dt are true for 1, true, t, yes or y and
+    false for 0, false, f, no or n (in any case). It is read and calculated chunk_size students at a time
+    with calculate_tuition_batch(), and each student's total is written
+    before the next chunk is read, so memory use does not depend on the
+    size of the roster. Blank lines are skipped, and a student whose
+    credits are missing or not a number, or whose resident or dt cell is
+    missing or not one of those values, gets an error instead of a total,
+    like a student with negative credits.
+
+    Args:
+        roster (file object): the open roster file.
+        output (file object): where to write a CSV line of student,
+            tuition and error for each student.
+        chunk_size (int): the number of students per chunk
+            (default: ROSTER_CHUNK).
+
+    Returns:
+        dict: "students", "errors" and "revenue" for the whole roster,
+        "by_group" mapping each (resident, dt) pair to its number of
+        students and revenue, and "seconds" taken.
+    """
+    start = time.perf_counter()
+    summary = {"students": 0, "errors": 0, "revenue": 0.0,
+               "by_group": {group: [0, 0.0] for group in TUITION_RATES}}
+    reader = csv.reader(roster)
+    next(reader, None)
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(("student", "tuition", "error"))
+
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            break
+        rows = [_roster_row(row) for row in chunk if any(cell.strip() for cell in row)]
+        if not rows:
+            continue
+        students = [row[0] for row in rows]
+        credits = np.array([row[1] for row in rows])
+        resident = np.array([row[2] for row in rows])
+        dt = np.array([row[3] for row in rows])
+        tuition, errors = calculate_tuition_batch(credits, resident, dt)
+        for i, row in enumerate(rows):
+            if row[4] is not None:
+                tuition[i] = np.nan
+                errors[i] = row[4]
+
+        writer.writerows((student, "" if i in errors else amount, str(errors.get(i, "")))
+                         for i, (student, amount) in enumerate(zip(students, tuition.tolist())))
+
+        valid = ~np.isnan(tuition)
+        for (group_resident, group_dt), totals in summary["by_group"].items():
+            in_group = valid & (resident == group_resident) & (dt == group_dt)
+            totals[0] += int(in_group.sum())
+            totals[1] += float(tuition[in_group].sum())
+        summary["students"] += len(rows)
+        summary["errors"] += len(errors)
+        summary["revenue"] += float(tuition[valid].sum())
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def _roster_row(row):
+    """Parse one roster row into (student, credits, resident, dt, error).
+
+    Missing cells are treated as empty. If a cell cannot be parsed, error
+    is a ValueError describing the first such cell and the other values
+    are placeholders; otherwise error is None.
+    """
+    student, credits, resident, dt = (row + [""] * len(ROSTER_COLUMNS))[:len(ROSTER_COLUMNS)]
+    error = None
+    try:
+        credits = float(credits)
+    except ValueError:
+        credits = np.nan
+    if not np.isfinite(credits):
+        credits = 0.0
+        error = ValueError("credits must be a number.")
+
+    flags = []
+    for name, value in (("resident", resident), ("dt", dt)):
+        value = value.strip().lower()
+        if value not in TRUE_VALUES | FALSE_VALUES and error is None:
+            error = ValueError(f"{name} must be true or false.")
+        flags.append(value in TRUE_VALUES)
+    return (student, credits, flags[0], flags[1], error)
+
+
+def roster_main(roster_filename, output_filename=None):
+    """Bills a roster file and reports revenue and throughput.
+
+    Args:
+        roster_filename (str): path to the roster file, or "-" for
+            standard input.
+        output_filename (str or None): where to write each student's
+            tuition (default: standard output).
+    """
+    with (nullcontext(sys.stdin) if roster_filename == "-"
+          else open(roster_filename, newline="", encoding="utf-8")) as roster, \
+            (open(output_filename, "w", newline="", encoding="utf-8") if output_filename
+             else nullcontext(sys.stdout)) as output:
+        summary = bill_roster(roster, output)
+
+    print(f"Billed {summary['students']} students ({summary['errors']} errors): "
+          f"total revenue ${summary['revenue']:.2f}", file=sys.stderr)
+    for (resident, dt), (students, revenue) in summary["by_group"].items():
+        print(f"  {'resident' if resident else 'nonresident'}, {'with' if dt else 'without'} "
+              f"differential tuition: {students} students, ${revenue:.2f}", file=sys.stderr)
+    rate = summary["students"] / summary["seconds"] if summary["seconds"] else 0.0
+    print(f"{summary['seconds']:.3f}s, {rate:.0f} rows/sec", file=sys.stderr)
 
 
 def parse_args(arglist):
@@ -61,23 +249,32 @@ def parse_args(arglist):
         resident (action: 'store_true')
     -dt / --differentialtuition: indicates the student pays differential
         tuition (action: 'store_true')
+    -r / --roster: a roster CSV file to bill instead, or "-" for
+        standard input (type: str)
+    -o / --output: where to write the roster's tuition (type: str,
+        default: standard output)
 
     Args:
         arglist (list of str): a list of command-line arguments.
 
     Returns:
-        namespace: a namespace with variables credits, nonresident, and
-        differentialtuition.
+        namespace: a namespace with variables credits, nonresident,
+        differentialtuition, roster, and output.
     """
     parser = argparse.ArgumentParser()
     parser.add_argument("-c", "--credits", type=int, default=12, help="the number of credits the student is taking")
     parser.add_argument("-nr", "--nonresident", action="store_true", help="indicates the student is not a Maryland resident")
     parser.add_argument("-dt", "--differentialtuition", action="store_true", help="indicates the student pays differential tuition")
+    parser.add_argument("-r", "--roster", help="a roster CSV file to bill, or - for standard input")
+    parser.add_argument("-o", "--output", help="where to write the roster's tuition (default: standard output)")
     return parser.parse_args(arglist)
 
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
+    if args.roster:
+        roster_main(args.roster, args.output)
+        sys.exit()
     resident = not args.nonresident
     tuition = calculate_tuition(args.credits, resident, args.differentialtuition)
     print(f"Your tuition and fees total ${tuition}.")
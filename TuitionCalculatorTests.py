@@ -0,0 +1,119 @@
+import contextlib
+import csv
+import importlib.util
+import io
+import itertools
+import math
+import os
+import sys
+
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "tuition_calculator", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tuition Calculator.py"))
+tuition_calculator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tuition_calculator)
+calculate_tuition = tuition_calculator.calculate_tuition
+calculate_tuition_batch = tuition_calculator.calculate_tuition_batch
+
+
+def test_calculate_tuition():
+    assert calculate_tuition(0, True, False) == 0.0
+    assert calculate_tuition(5, True, False) == 1835.0
+    assert calculate_tuition(5, True, True) == 2425.0
+    assert calculate_tuition(15, True, True) == 5840.0
+    assert calculate_tuition(5, False, True) == 7280.0
+    assert calculate_tuition(12, False, False) == 17468.0
+
+def test_calculate_tuition_batch_matches_scalar():
+    credits = []
+    resident = []
+    dt = []
+    for c in list(range(-2, 25)) + [0.5, 11.5, 12.5]:
+        for r in (True, False):
+            for d in (True, False):
+                credits.append(c)
+                resident.append(r)
+                dt.append(d)
+
+    tuition, errors = calculate_tuition_batch(credits, resident, dt)
+    for i, (c, r, d) in enumerate(zip(credits, resident, dt)):
+        if c < 0:
+            assert math.isnan(tuition[i])
+            assert str(errors[i]) == "credits must be non-negative."
+        else:
+            assert tuition[i] == calculate_tuition(c, r, d)
+            assert i not in errors
+
+def test_calculate_tuition_batch_integer_arrays():
+    credits = np.arange(0, 20)
+    tuition, errors = calculate_tuition_batch(credits, True, True)
+    assert tuition.tolist() == [calculate_tuition(int(c), True, True) for c in credits]
+    assert errors == {}
+
+def bill(roster_text, chunk_size=3):
+    """Bill a roster given as text and return (output rows, summary)."""
+    output = io.StringIO()
+    summary = tuition_calculator.bill_roster(io.StringIO(roster_text), output, chunk_size)
+    return list(csv.reader(io.StringIO(output.getvalue()))), summary
+
+def test_bill_roster_totals():
+    roster = "student,credits,resident,dt\n"
+    expected = []
+    for i, (credits, resident, dt) in enumerate(itertools.product([0, 5, 12, 15], [True, False], [True, False])):
+        roster += f"s{i},{credits},{'yes' if resident else 'no'},{'1' if dt else '0'}\n"
+        expected.append([f"s{i}", str(calculate_tuition(credits, resident, dt)), ""])
+    rows, summary = bill(roster)
+    assert rows[0] == ["student", "tuition", "error"]
+    assert rows[1:] == expected
+    assert summary["students"] == len(expected) and summary["errors"] == 0
+    assert summary["revenue"] == sum(float(row[1]) for row in expected)
+    assert sum(students for students, _ in summary["by_group"].values()) == len(expected)
+
+def test_bill_roster_bad_rows():
+    rows, summary = bill("student,credits,resident,dt\n"
+                         "a,3,yes,no\n"
+                         "\n"
+                         "b,x,yes,no\n"
+                         "c,,no,no\n"
+                         "d,5\n"
+                         "e,5,ye,no\n"
+                         "f,5,Resident,0\n"
+                         "g,-1,y,n\n"
+                         "h,15,Y,TRUE\n")
+    assert rows[1:] == [
+        ["a", "1101.0", ""],
+        ["b", "", "credits must be a number."],
+        ["c", "", "credits must be a number."],
+        ["d", "", "resident must be true or false."],
+        ["e", "", "resident must be true or false."],
+        ["f", "", "resident must be true or false."],
+        ["g", "", "credits must be non-negative."],
+        ["h", "5840.0", ""],
+    ]
+    assert summary["students"] == 8 and summary["errors"] == 6
+    assert summary["revenue"] == 1101.0 + 5840.0
+
+def test_roster_main_leaves_standard_streams_open():
+    stdin = io.StringIO("student,credits,resident,dt\na,3,yes,no\nb,x,no,no\n")
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_stdin, sys.stdin = sys.stdin, stdin
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            tuition_calculator.roster_main("-")
+    finally:
+        sys.stdin = saved_stdin
+    assert not stdin.closed and not stdout.closed
+    assert list(csv.reader(io.StringIO(stdout.getvalue())))[1:] == [["a", "1101.0", ""],
+                                                                    ["b", "", "credits must be a number."]]
+    assert stderr.getvalue().startswith("Billed 2 students (1 errors)")
+
+
+if __name__ == "__main__":
+    test_calculate_tuition()
+    test_calculate_tuition_batch_matches_scalar()
+    test_calculate_tuition_batch_integer_arrays()
+    test_bill_roster_totals()
+    test_bill_roster_bad_rows()
+    test_roster_main_leaves_standard_streams_open()
+    print("All tests passed!")
@@ -1,5 +1,10 @@
+from array import array
+from collections.abc import Mapping
+from multiprocessing import Pool
 import re
 
+from Vocabulary import Vocabulary, iter_words
+
 
 def get_words(s):
     """ Extract a list of words from string s.
@@ -20,10 +25,44 @@ def get_words(s):
 
 
 class UniqueWords:
-    def __init__(self):
-        self.all_words = set()
-        self.unique_words = set()
-        self.words_by_file = {}
+    """Track which words occur in only one of a set of files.
+
+    Words are interned in a Vocabulary (which may be shared with other
+    indexes). Each file's words are kept as a sorted array of IDs, and the
+    sets of words seen so far and of words seen in exactly one file are
+    kept as bitsets, so updating them is a handful of bitwise operations.
+
+    Attributes:
+        vocabulary (Vocabulary): the word <-> ID mapping.
+        all_words (set of str): every word seen so far.
+        unique_words (set of str): words that occur in exactly one file.
+        words_by_file (Mapping): read-only mapping of file nickname to the
+            set of words in that file.
+    """
+
+    def __init__(self, vocabulary=None):
+        """Create an empty UniqueWords.
+
+        Args:
+            vocabulary (Vocabulary): vocabulary to intern words in; by
+                default a new one is created.
+        """
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        self._ids_by_file = {}
+        self._all = 0
+        self._unique = 0
+
+    @property
+    def all_words(self):
+        return set(self.vocabulary.lookup(_bitset_ids(self._all)))
+
+    @property
+    def unique_words(self):
+        return set(self.vocabulary.lookup(_bitset_ids(self._unique)))
+
+    @property
+    def words_by_file(self):
+        return _WordsByFile(self)
 
     def add_file(self, filename, key):
         """Read file and extract words.
@@ -31,22 +70,155 @@ class UniqueWords:
             filename (str): The path to the file that has to be read
             key (str): A nickname for the file
         """
-        with open(filename, 'r') as file:
-            content = file.read()
+        self._add_words(key, _distinct_words(filename))
+
+    def add_files(self, files, workers=1):
+        """Read several files, optionally tokenizing them in parallel.
+
+        Files are tokenized in a process pool, but their words are added in
+        the order of files, so the result is the same as calling add_file
+        on each one in turn.
+
+        Args:
+            files (dict of str: str): maps each file's nickname to its path.
+            workers (int): number of processes to tokenize with (default: 1).
+        """
+        keys = list(files)
+        filenames = [files[key] for key in keys]
+        if workers <= 1 or len(filenames) < 2:
+            for key, filename in zip(keys, filenames):
+                self.add_file(filename, key)
+            return
+
+        chunksize = max(1, len(filenames) // (workers * 4))
+        with Pool(workers) as pool:
+            for key, words in zip(keys, pool.imap(_distinct_words, filenames, chunksize)):
+                self._add_words(key, words)
+
+    def _add_words(self, key, words):
+        """Record the distinct words of a file under key."""
+        ids = self.vocabulary.intern(words)
+        bits = _bitset(ids)
+        self._ids_by_file[key] = ids
+        self._unique &= ~bits
+        self._unique |= bits & ~self._all
+        self._all |= bits
+
+    def unique(self, key):
+        """Return the set of words unique to the file
+        Args:
+            key (str): A nickname for the file previously read.
+        """
+        ids = self._ids_by_file[key]
+        if not ids:
+            return set()
+        size = ids[-1] // 8 + 1
+        unique = (self._unique & ((1 << size * 8) - 1)).to_bytes(size, 'little')
+        return set(self.vocabulary.lookup(i for i in ids if unique[i >> 3] >> (i & 7) & 1))
+
+
+class CountingUniqueWords(UniqueWords):
+    """UniqueWords that keeps per-word file counts instead of bitsets.
+
+    For every word ID it records how many files contain the word and, while
+    that count is 1, which file owns it. Each file's unique words are kept
+    up to date as files are added, so add_file costs time proportional to
+    the file's own vocabulary and unique() is a lookup.
+    """
+
+    def __init__(self, vocabulary=None):
+        """Create an empty CountingUniqueWords.
+
+        Args:
+            vocabulary (Vocabulary): vocabulary to intern words in; by
+                default a new one is created.
+        """
+        super().__init__(vocabulary)
+        self._file_counts = array('I')
+        self._owners = array('i')
+        self._unique_by_file = []
+        self._file_index = {}
 
-        words = get_words(content)
-        words_set = set(words)
+    @property
+    def all_words(self):
+        counts = self._file_counts
+        return set(self.vocabulary.lookup(i for i in range(len(counts)) if counts[i]))
 
-        self.words_by_file[key] = words_set
-        self.unique_words -= words_set
+    @property
+    def unique_words(self):
+        return set(self.vocabulary.lookup(i for ids in self._unique_by_file for i in ids))
 
-        newwords = words_set - self.all_words
-        self.unique_words.update(newwords)
-        self.all_words.update(newwords)
+    def _add_words(self, key, words):
+        """Record the distinct words of a file under key."""
+        ids = self.vocabulary.intern(words)
+        missing = len(self.vocabulary) - len(self._file_counts)
+        if missing > 0:
+            self._file_counts.frombytes(bytes(missing * self._file_counts.itemsize))
+            self._owners.frombytes(bytes(missing * self._owners.itemsize))
+
+        index = len(self._unique_by_file)
+        owned = set()
+        counts, owners = self._file_counts, self._owners
+        for i in ids:
+            count = counts[i]
+            if count == 0:
+                owned.add(i)
+                owners[i] = index
+            elif count == 1:
+                self._unique_by_file[owners[i]].discard(i)
+            counts[i] = count + 1
+
+        self._ids_by_file[key] = ids
+        self._file_index[key] = index
+        self._unique_by_file.append(owned)
 
     def unique(self, key):
         """Return the set of words unique to the file
         Args:
             key (str): A nickname for the file previously read.
         """
-        return self.words_by_file[key].intersection(self.unique_words)
+        return set(self.vocabulary.lookup(self._unique_by_file[self._file_index[key]]))
+
+
+class _WordsByFile(Mapping):
+    """Read-only view of a UniqueWords' files as sets of words."""
+
+    def __init__(self, unique_words):
+        self._unique_words = unique_words
+
+    def __getitem__(self, key):
+        ids = self._unique_words._ids_by_file[key]
+        return set(self._unique_words.vocabulary.lookup(ids))
+
+    def __iter__(self):
+        return iter(self._unique_words._ids_by_file)
+
+    def __len__(self):
+        return len(self._unique_words._ids_by_file)
+
+
+def _distinct_words(filename):
+    """Return the distinct words of a file, in order of first appearance."""
+    with open(filename, 'r') as file:
+        return list(dict.fromkeys(iter_words(file)))
+
+
+def _bitset(ids):
+    """Return an int with bit i set for each i in a sorted array of IDs."""
+    if not ids:
+        return 0
+    buf = bytearray(ids[-1] // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _bitset_ids(bits):
+    """Return the positions of the set bits of an int, in increasing order."""
+    ids = []
+    for byte_index, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            ids.append(byte_index * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ids
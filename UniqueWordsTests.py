@@ -0,0 +1,95 @@
+import os
+import random
+import tempfile
+
+from UniqueWords import CountingUniqueWords, UniqueWords, get_words
+
+WORDS = ["alpha", "beta", "gamma", "delta", "don't", "well-known", "x_y", "zeta", "eta", "theta",
+         "Alpha", "BETA", "iota", "kappa", "lambda"]
+
+
+def write_files(directory, count, seed=0):
+    """Write count random texts to directory and return {nickname: path}."""
+    rng = random.Random(seed)
+    files = {}
+    for i in range(count):
+        path = os.path.join(directory, f"file{i:03d}.txt")
+        with open(path, "w") as file:
+            file.write(" -- ".join(rng.choice(WORDS) for _ in range(rng.randrange(0, 12))))
+        files[f"key{i}"] = path
+    return files
+
+def reference(files):
+    """all_words, unique_words and each file's unique words, computed with plain sets."""
+    by_file = {}
+    for key, path in files.items():
+        with open(path) as file:
+            by_file[key] = set(get_words(file.read()))
+    all_words = set().union(*by_file.values())
+    unique = {key: words.difference(*(other for k, other in by_file.items() if k != key))
+              for key, words in by_file.items()}
+    return by_file, all_words, set().union(*unique.values()), unique
+
+def check(uw, files):
+    by_file, all_words, unique_words, unique = reference(files)
+    assert uw.all_words == all_words
+    assert uw.unique_words == unique_words
+    assert dict(uw.words_by_file) == by_file
+    for key in files:
+        assert uw.unique(key) == unique[key]
+
+def test_matches_reference():
+    with tempfile.TemporaryDirectory() as directory:
+        for seed in range(5):
+            files = write_files(directory, 12, seed)
+            for cls in (UniqueWords, CountingUniqueWords):
+                uw = cls()
+                for key, path in files.items():
+                    uw.add_file(path, key)
+                check(uw, files)
+
+def test_shared_vocabulary():
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, 8, seed=7)
+        plain = UniqueWords()
+        counting = CountingUniqueWords(plain.vocabulary)
+        for key, path in files.items():
+            plain.add_file(path, key)
+            counting.add_file(path, key)
+        assert counting.vocabulary is plain.vocabulary
+        check(plain, files)
+        check(counting, files)
+
+def test_empty_file():
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, 3, seed=8)
+        empty = os.path.join(directory, "empty.txt")
+        open(empty, "w").close()
+        files["empty"] = empty
+        for cls in (UniqueWords, CountingUniqueWords):
+            uw = cls()
+            for key, path in files.items():
+                uw.add_file(path, key)
+            assert uw.unique("empty") == set()
+            check(uw, files)
+
+def test_add_files_workers_matches_serial():
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, 30, seed=9)
+        for cls in (UniqueWords, CountingUniqueWords):
+            serial = cls()
+            serial.add_files(files)
+            parallel = cls()
+            parallel.add_files(files, workers=3)
+            assert parallel.vocabulary.words == serial.vocabulary.words
+            assert list(parallel.words_by_file) == list(files)
+            check(serial, files)
+            check(parallel, files)
+
+
+if __name__ == "__main__":
+    test_matches_reference()
+    test_shared_vocabulary()
+    test_empty_file()
+    test_add_files_workers_matches_serial()
+    print("All tests passed!")
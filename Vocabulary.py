@@ -0,0 +1,110 @@
+from array import array
+import re
+
+CHUNK_SIZE = 1 << 16  # characters read at a time by iter_words()
+
+_WORD_RUN = re.compile(r"[\w'-]+")
+_DASHES = re.compile(r"--+")
+
+
+class Vocabulary:
+    """Intern words as dense integer IDs.
+
+    A single Vocabulary can be shared by several indexes (for example a
+    UniqueWords and a TfidfCalculator), so each distinct word string is
+    stored only once no matter how many files contain it.
+
+    Attributes:
+        ids (dict of str: int): the ID of each word seen so far.
+        words (list of str): the word for each ID.
+    """
+
+    def __init__(self, words=()):
+        """Create a vocabulary, optionally pre-loaded with words.
+
+        Args:
+            words (iterable of str): words to assign IDs 0, 1, 2, ... to, in
+                order. The words must be distinct.
+        """
+        self.words = list(words)
+        self.ids = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def id(self, word):
+        """Return the ID of word, assigning the next free ID if it is new.
+
+        Args:
+            word (str): the word to look up.
+
+        Returns:
+            int: the word's ID.
+        """
+        i = self.ids.get(word)
+        if i is None:
+            i = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return i
+
+    def intern(self, words):
+        """Return the distinct IDs of some words as a sorted array.
+
+        New words are assigned IDs in order of first appearance, so
+        interning the same words in the same order always gives the same
+        IDs.
+
+        Args:
+            words (iterable of str): words to look up; repeats are ignored.
+
+        Returns:
+            array of int: the sorted, distinct IDs as an array('I').
+        """
+        return array('I', sorted(self.id(word) for word in dict.fromkeys(words)))
+
+    def lookup(self, ids):
+        """Return the words for a sequence of IDs.
+
+        Args:
+            ids (iterable of int): IDs previously returned by this vocabulary.
+
+        Returns:
+            list of str: the word for each ID, in order.
+        """
+        words = self.words
+        return [words[i] for i in ids]
+
+
+def iter_words(file, chunk_size=CHUNK_SIZE):
+    """ Generate the words in a file, reading it in fixed-size chunks.
+
+    This is the tokenizer shared by Tdidf and UniqueWords. It produces the
+    same words as their get_words(file.read()), but only holds one chunk
+    (plus any word that straddles the end of it) in memory at a time.
+
+    Args:
+        file (file object): A text file open for reading.
+        chunk_size (int): Number of characters to read at a time. (Default: CHUNK_SIZE)
+
+    Yields:
+        str: Each word in the file converted to lower-case.
+    """
+    carry = ""
+    while True:
+        chunk = file.read(chunk_size)
+        text = carry + chunk
+        carry = ""
+        for match in _WORD_RUN.finditer(text):
+            # A run touching the end of the chunk may continue in the next one
+            if chunk and match.end() == len(text):
+                carry = match.group()
+                break
+            for word in _DASHES.split(match.group()):
+                word = word.strip("'-_")
+                if len(word) > 0:
+                    yield word.lower()
+        if not chunk:
+            return